@@ -1,6 +1,6 @@
 {
     'name': 'Product Image Automation',
-    'version': '16.0.1.0.0',
+    'version': '16.0.1.1.0',
     'summary': 'Automated product image fetching and management',
     'description': '''
         Daily automation for Odoo 16 that ensures every product has at least one image.
@@ -1,5 +1,8 @@
 from . import product_image_config
 from . import product_image_log
+from . import product_image_negative_cache
+from . import product_image_search_cache
+from . import product_image_url_cache
 from . import product_template
 from . import image_fetcher_service
 from . import amazon_api_service
\ No newline at end of file
@@ -3,226 +3,393 @@ import hashlib
 import hmac
 import json
 import logging
+import threading
+import time
 import urllib.parse
-from datetime import datetime
+from types import MappingProxyType
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional, stdlib json is used as a fallback
+    orjson = None
+
+try:
+    import httpx
+    import h2  # noqa: F401 - required by httpx for HTTP/2
+except ImportError:  # optional, the pooled requests session is used instead
+    httpx = None
+
+TRANSPORT_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
 
 _logger = logging.getLogger(__name__)
 
+CONTENT_TYPE = 'application/json; charset=utf-8'
+SIGNED_HEADERS = 'content-type;host;x-amz-date;x-amz-target'
+SIGNING_ALGORITHM = 'AWS4-HMAC-SHA256'
+
+POOL_MAXSIZE = 16
+RESPONSE_CACHE_MAXSIZE = 50000
+RESPONSE_CACHE_TTL = 86400  # seconds a found item is reused
+NEGATIVE_CACHE_TTL = 3600  # seconds a known miss is remembered
+MAX_ATTEMPTS = 3
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+RETRY_BACKOFF = 0.3  # seconds, doubled on every attempt
+SIGNATURE_REUSE_SECONDS = 5  # well inside Amazon's clock-skew window
+IMAGE_RESOURCES = [
+    "Images.Primary.Large",
+    "Images.Primary.Medium",
+    "ItemInfo.Title",
+    "ItemInfo.ProductInfo"
+]
+
+_sha256 = hashlib.sha256
+_hmac_new = hmac.new
+
 
 class AmazonPAAPIService:
     """Amazon Product Advertising API 5.0 Service"""
     
-    def __init__(self, access_key, secret_key, partner_tag, marketplace='US'):
+    # Marketplace endpoints
+    _ENDPOINTS = MappingProxyType({
+        'US': 'webservices.amazon.com',
+        'CA': 'webservices.amazon.ca',
+        'UK': 'webservices.amazon.co.uk',
+        'DE': 'webservices.amazon.de',
+        'FR': 'webservices.amazon.fr',
+        'IT': 'webservices.amazon.it',
+        'ES': 'webservices.amazon.es',
+        'JP': 'webservices.amazon.co.jp',
+    })
+    
+    # AWS region for each marketplace
+    _REGIONS = MappingProxyType({
+        'US': 'us-east-1',
+        'CA': 'us-east-1',
+        'UK': 'eu-west-1',
+        'DE': 'eu-west-1',
+        'FR': 'eu-west-1',
+        'IT': 'eu-west-1',
+        'ES': 'eu-west-1',
+        'JP': 'us-west-2',
+    })
+    
+    # Request path for each supported PA-API operation
+    _OPERATION_URIS = MappingProxyType({
+        'SearchItems': '/paapi5/searchitems',
+        'GetItems': '/paapi5/getitems',
+    })
+    
+    def __init__(self, access_key, secret_key, partner_tag, marketplace='US', requests_per_second=1):
         self.access_key = access_key
         self.secret_key = secret_key
         self.partner_tag = partner_tag
         self.marketplace = marketplace
         
-        # Marketplace endpoints
-        self.endpoints = {
-            'US': 'webservices.amazon.com',
-            'CA': 'webservices.amazon.ca',
-            'UK': 'webservices.amazon.co.uk',
-            'DE': 'webservices.amazon.de',
-            'FR': 'webservices.amazon.fr',
-            'IT': 'webservices.amazon.it',
-            'ES': 'webservices.amazon.es',
-            'JP': 'webservices.amazon.co.jp',
+        self.host = self._ENDPOINTS.get(marketplace, self._ENDPOINTS['US'])
+        self.region = self._REGIONS.get(marketplace, 'us-east-1')
+        
+        # Per-instance request strings that only depend on the marketplace
+        self._marketplace_domain = f"www.amazon.{marketplace.lower()}"
+        self._routes = {
+            operation: (
+                uri,
+                f'https://{self.host}{uri}',
+                f'com.amazon.paapi5.v1.ProductAdvertisingAPIv1.{operation}',
+            )
+            for operation, uri in self._OPERATION_URIS.items()
         }
         
-        self.host = self.endpoints.get(marketplace, self.endpoints['US'])
-        self.region = self._get_region_for_marketplace(marketplace)
+        # Derived SigV4 signing key, only valid for a single UTC date
+        self._secret_key_bytes = f'AWS4{secret_key}'.encode('utf-8')
+        self._hmac_template = _hmac_new(self._secret_key_bytes, None, _sha256)
+        self._signing_key_cache = {}
+        
+        # Invariant parts of the canonical request and credential scope
+        self._canonical_headers_prefix = f'content-type:{CONTENT_TYPE}\nhost:{self.host}\n'
+        self._credential_scope_suffix = f'/{self.region}/ProductAdvertisingAPI/aws4_request'
+        
+        # (marketplace, keywords) -> (expires_at, image_info or None)
+        self._response_cache = {}
+        self._response_cache_lock = threading.Lock()
+        
+        # Each permit is held for at least one second, capping throughput at
+        # the account's PA-API TPS budget when calls run concurrently
+        self._tps_semaphore = threading.BoundedSemaphore(max(1, requests_per_second))
+        
+        # Persistent client so keep-alive reuses the TLS connection across calls
+        self._client = self._build_client()
     
-    def _get_region_for_marketplace(self, marketplace):
-        """Get AWS region for marketplace"""
-        regions = {
-            'US': 'us-east-1',
-            'CA': 'us-east-1', 
-            'UK': 'eu-west-1',
-            'DE': 'eu-west-1',
-            'FR': 'eu-west-1',
-            'IT': 'eu-west-1',
-            'ES': 'eu-west-1',
-            'JP': 'us-west-2',
-        }
-        return regions.get(marketplace, 'us-east-1')
+    def _build_client(self):
+        """Build the pooled HTTP client, multiplexed over HTTP/2 when httpx is available"""
+        if httpx is not None:
+            return httpx.Client(
+                transport=httpx.HTTPTransport(
+                    http2=True,
+                    retries=3,
+                    limits=httpx.Limits(
+                        max_connections=POOL_MAXSIZE,
+                        max_keepalive_connections=POOL_MAXSIZE,
+                    ),
+                ),
+                headers={'Content-Type': CONTENT_TYPE},
+                timeout=30,
+            )
+        
+        session = requests.Session()
+        session.headers.update({
+            'Content-Type': CONTENT_TYPE,
+        })
+        session.mount('https://', HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=POOL_MAXSIZE,
+            # Status retries are done by _make_request so signatures can be reused
+            max_retries=Retry(
+                total=3,
+                backoff_factor=RETRY_BACKOFF,
+                allowed_methods=frozenset(['POST']),
+            ),
+        ))
+        return session
+    
+    def close(self):
+        """Release pooled connections held by the HTTP client"""
+        self._client.close()
     
     def search_items(self, keywords=None, identifiers=None):
-        """Search for items using keywords or identifiers"""
+        """Search for items by keywords and return the first one's image info
+        
+        SearchItems only takes keywords; barcodes are searched as keywords
+        too, since ItemIds lookups belong to GetItems and only accept ASINs.
+        ``identifiers`` (e.g. {'EAN': '...'}) is still accepted for existing
+        callers: its first EAN, UPC or ISBN value replaces the keywords.
+        """
+        for id_type, value in (identifiers or {}).items():
+            if id_type.upper() in ('EAN', 'UPC', 'ISBN') and value:
+                keywords = value
+                break
+        if not keywords:
+            return None
+        
+        cache_key = (self.marketplace, keywords)
+        hit, cached = self._cache_get(cache_key)
+        if hit:
+            return cached
+        
         try:
-            # Prepare request payload
             payload = {
                 "PartnerTag": self.partner_tag,
                 "PartnerType": "Associates",
-                "Marketplace": f"www.amazon.{self.marketplace.lower()}",
-                "Resources": [
-                    "Images.Primary.Large",
-                    "Images.Primary.Medium", 
-                    "ItemInfo.Title",
-                    "ItemInfo.ProductInfo"
-                ]
+                "Marketplace": self._marketplace_domain,
+                "Keywords": keywords,
+                "SearchIndex": "All",
+                "Resources": IMAGE_RESOURCES
             }
             
-            # Add search parameters
-            if identifiers:
-                # Search by identifier (EAN, UPC, etc.)
-                for id_type, value in identifiers.items():
-                    if id_type.upper() in ['EAN', 'UPC', 'ISBN']:
-                        payload["ItemIds"] = [value]
-                        payload["ItemIdType"] = id_type.upper()
-                        break
-            else:
-                # Search by keywords
-                payload["Keywords"] = keywords
-                payload["SearchIndex"] = "All"
-            
             # Make the API request
             response = self._make_request('SearchItems', payload)
             
-            if response and 'SearchResult' in response:
-                items = response['SearchResult'].get('Items', [])
-                if items:
-                    return self._extract_image_info(items[0])
+            if response is not None:
+                result = None
+                if 'SearchResult' in response:
+                    items = response['SearchResult'].get('Items', [])
+                    if items:
+                        result = self._extract_image_info(items[0])
+                # Only answers from Amazon are cached; transport errors are retried next time
+                self._cache_set(cache_key, result)
+                return result
             
-        except Exception as e:
-            _logger.error(f"Amazon PA-API search failed: {str(e)}")
+        except (*TRANSPORT_ERRORS, ValueError, KeyError):
+            _logger.exception("Amazon PA-API search failed")
         
         return None
     
+    def _cache_get(self, key):
+        """Return (hit, value) for a cached search_items result"""
+        if key is None:
+            return False, None
+        with self._response_cache_lock:
+            entry = self._response_cache.get(key)
+            if entry is None:
+                return False, None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._response_cache[key]
+                return False, None
+            return True, value
+    
+    def _cache_set(self, key, value):
+        """Cache a search_items result; misses expire sooner than hits"""
+        if key is None:
+            return
+        ttl = RESPONSE_CACHE_TTL if value else NEGATIVE_CACHE_TTL
+        with self._response_cache_lock:
+            if key not in self._response_cache and len(self._response_cache) >= RESPONSE_CACHE_MAXSIZE:
+                # Evict the oldest insertion
+                del self._response_cache[next(iter(self._response_cache))]
+            self._response_cache[key] = (time.monotonic() + ttl, value)
+    
+    def search_items_throttled(self, keywords):
+        """Call search_items while holding a TPS permit for at least a second
+        
+        Safe to call from several threads; they share the account's TPS budget.
+        Cached answers are returned without taking a permit, as they send no
+        request.
+        """
+        hit, cached = self._cache_get((self.marketplace, keywords))
+        if hit:
+            return cached
+        with self._tps_semaphore:
+            started = time.monotonic()
+            result = self.search_items(keywords)
+            remaining = 1.0 - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+        return result
+    
     def _extract_image_info(self, item):
         """Extract image information from Amazon item"""
-        try:
-            images = item.get('Images', {})
-            primary = images.get('Primary', {})
-            
-            # Try large image first, fallback to medium
-            large_image = primary.get('Large', {})
-            if large_image and large_image.get('URL'):
-                return {
-                    'url': large_image['URL'],
-                    'width': large_image.get('Width', 0),
-                    'height': large_image.get('Height', 0)
-                }
-            
-            medium_image = primary.get('Medium', {})
-            if medium_image and medium_image.get('URL'):
-                return {
-                    'url': medium_image['URL'], 
-                    'width': medium_image.get('Width', 0),
-                    'height': medium_image.get('Height', 0)
-                }
-            
-        except Exception as e:
-            _logger.warning(f"Failed to extract image info: {str(e)}")
+        images = item.get('Images', {})
+        primary = images.get('Primary', {})
+        
+        # Try large image first, fallback to medium
+        large_image = primary.get('Large', {})
+        if large_image and large_image.get('URL'):
+            return {
+                'url': large_image['URL'],
+                'width': large_image.get('Width', 0),
+                'height': large_image.get('Height', 0)
+            }
+        
+        medium_image = primary.get('Medium', {})
+        if medium_image and medium_image.get('URL'):
+            return {
+                'url': medium_image['URL'], 
+                'width': medium_image.get('Width', 0),
+                'height': medium_image.get('Height', 0)
+            }
         
         return None
     
     def _make_request(self, operation, payload):
         """Make authenticated request to Amazon PA-API"""
         try:
-            import requests
-            
             # Request details
             method = 'POST'
-            uri = '/paapi5/searchitems'
-            
-            if operation == 'GetItems':
-                uri = '/paapi5/getitems'
+            uri, url, target = self._routes[operation]
             
             # Headers
             headers = {
-                'Content-Type': 'application/json; charset=utf-8',
-                'X-Amz-Target': f'com.amazon.paapi5.v1.ProductAdvertisingAPIv1.{operation}',
+                'Content-Type': CONTENT_TYPE,
+                'X-Amz-Target': target,
                 'Host': self.host
             }
             
             # Convert payload to JSON
             payload_json = json.dumps(payload, separators=(',', ':'))
             
-            # Sign the request
-            signed_headers = self._sign_request(
-                method, uri, headers, payload_json
-            )
-            
-            # Make the request
-            url = f'https://{self.host}{uri}'
-            response = requests.post(
-                url, 
-                data=payload_json,
-                headers=signed_headers,
-                timeout=30
-            )
+            # Sign and send; throttled/5xx answers are retried with the same
+            # signature while it is still fresh, and re-signed otherwise
+            signed_headers = None
+            signed_at = 0.0
+            for attempt in range(MAX_ATTEMPTS):
+                if signed_headers is None or time.monotonic() - signed_at >= SIGNATURE_REUSE_SECONDS:
+                    signed_headers = self._sign_request(
+                        method, uri, dict(headers), payload_json
+                    )
+                    signed_at = time.monotonic()
+                
+                response = self._post(url, payload_json, signed_headers)
+                if response.status_code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS - 1:
+                    break
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
             
             if response.status_code == 200:
+                if orjson is not None:
+                    return orjson.loads(response.content)
                 return response.json()
             else:
                 _logger.error(f"Amazon API error: {response.status_code} - {response.text}")
                 return None
                 
-        except Exception as e:
-            _logger.error(f"Amazon API request failed: {str(e)}")
+        except (*TRANSPORT_ERRORS, ValueError):
+            _logger.exception("Amazon API request failed")
             return None
     
+    def _post(self, url, payload_json, headers):
+        """POST a signed payload through whichever client is in use"""
+        if httpx is not None:
+            return self._client.post(url, content=payload_json, headers=headers)
+        return self._client.post(url, data=payload_json, headers=headers, timeout=30)
+    
     def _sign_request(self, method, uri, headers, payload):
         """Sign request using AWS Signature Version 4"""
-        try:
-            # Step 1: Create canonical request
-            canonical_headers = []
-            signed_headers_list = []
-            
-            # Add required headers for signing
-            timestamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
-            date_stamp = timestamp[:8]
-            
-            headers['X-Amz-Date'] = timestamp
-            
-            # Sort headers for canonical request
-            for key in sorted(headers.keys(), key=str.lower):
-                canonical_headers.append(f'{key.lower()}:{headers[key].strip()}')
-                signed_headers_list.append(key.lower())
-            
-            canonical_headers_str = '\n'.join(canonical_headers)
-            signed_headers_str = ';'.join(signed_headers_list)
-            
-            # Create payload hash
-            payload_hash = hashlib.sha256(payload.encode('utf-8')).hexdigest()
-            
-            # Create canonical request
-            canonical_request = f"{method}\n{uri}\n\n{canonical_headers_str}\n\n{signed_headers_str}\n{payload_hash}"
-            
-            # Step 2: Create string to sign
-            algorithm = 'AWS4-HMAC-SHA256'
-            credential_scope = f'{date_stamp}/{self.region}/ProductAdvertisingAPI/aws4_request'
-            string_to_sign = f"{algorithm}\n{timestamp}\n{credential_scope}\n{hashlib.sha256(canonical_request.encode('utf-8')).hexdigest()}"
-            
-            # Step 3: Calculate signature
-            signing_key = self._get_signature_key(date_stamp)
-            signature = hmac.new(signing_key, string_to_sign.encode('utf-8'), hashlib.sha256).hexdigest()
-            
-            # Step 4: Add authorization header
-            authorization = (
-                f'{algorithm} '
-                f'Credential={self.access_key}/{credential_scope}, '
-                f'SignedHeaders={signed_headers_str}, '
-                f'Signature={signature}'
-            )
-            
-            headers['Authorization'] = authorization
-            
-            return headers
-            
-        except Exception as e:
-            _logger.error(f"Request signing failed: {str(e)}")
-            return headers
+        # Add required headers for signing
+        gm = time.gmtime()
+        timestamp = (
+            f"{gm.tm_year:04d}{gm.tm_mon:02d}{gm.tm_mday:02d}"
+            f"T{gm.tm_hour:02d}{gm.tm_min:02d}{gm.tm_sec:02d}Z"
+        )
+        date_stamp = timestamp[:8]
+        
+        headers['X-Amz-Date'] = timestamp
+        
+        # Step 1: Create canonical request. The signed header set is fixed
+        # (content-type, host, x-amz-date, x-amz-target), so only the date
+        # and target are spliced into the precomputed prefix.
+        canonical_headers_str = (
+            f"{self._canonical_headers_prefix}"
+            f"x-amz-date:{timestamp}\n"
+            f"x-amz-target:{headers['X-Amz-Target']}"
+        )
+        
+        # Create payload hash
+        payload_hash = _sha256(payload.encode('utf-8')).hexdigest()
+        
+        # Create canonical request
+        canonical_request = f"{method}\n{uri}\n\n{canonical_headers_str}\n\n{SIGNED_HEADERS}\n{payload_hash}"
+        
+        # Step 2: Create string to sign
+        credential_scope = date_stamp + self._credential_scope_suffix
+        canonical_hash = _sha256(canonical_request.encode('utf-8')).hexdigest()
+        string_to_sign = f"{SIGNING_ALGORITHM}\n{timestamp}\n{credential_scope}\n{canonical_hash}"
+        
+        # Step 3: Calculate signature
+        signing_key = self._get_signature_key(date_stamp)
+        signature = _hmac_new(signing_key, string_to_sign.encode('utf-8'), _sha256).hexdigest()
+        
+        # Step 4: Add authorization header
+        authorization = (
+            f'{SIGNING_ALGORITHM} '
+            f'Credential={self.access_key}/{credential_scope}, '
+            f'SignedHeaders={SIGNED_HEADERS}, '
+            f'Signature={signature}'
+        )
+        
+        headers['Authorization'] = authorization
+        
+        return headers
     
     def _get_signature_key(self, date_stamp):
-        """Generate signing key for AWS signature"""
+        """Generate signing key for AWS signature (cached per date stamp)"""
+        key = self._signing_key_cache.get(date_stamp)
+        if key is not None:
+            return key
+        
         def sign(key, msg):
-            return hmac.new(key, msg.encode('utf-8'), hashlib.sha256).digest()
+            return _hmac_new(key, msg.encode('utf-8'), _sha256).digest()
         
-        k_date = sign(f'AWS4{self.secret_key}'.encode('utf-8'), date_stamp)
+        # The secret-keyed pads are set up once; copy() skips re-keying
+        h = self._hmac_template.copy()
+        h.update(date_stamp.encode('utf-8'))
+        k_date = h.digest()
         k_region = sign(k_date, self.region)
         k_service = sign(k_region, 'ProductAdvertisingAPI')
         k_signing = sign(k_service, 'aws4_request')
         
+        # Replace rather than add so the cache never outgrows one entry
+        self._signing_key_cache = {date_stamp: k_signing}
         return k_signing
\ No newline at end of file
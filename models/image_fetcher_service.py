@@ -1,60 +1,800 @@
 import base64
+import bisect
 import hashlib
 import logging
+import random
 import re
+import struct
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import namedtuple
+from functools import lru_cache
+from types import MappingProxyType
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from PIL import Image
 import io
 import json
-import hmac
 import urllib.parse
-from xml.etree import ElementTree as ET
+
+try:
+    import httpx
+    import h2  # noqa: F401 - required by httpx for HTTP/2
+except ImportError:  # optional, Google searches go through the requests session
+    httpx = None
 
 from odoo import api, fields, models, _
-from odoo.exceptions import UserError, ValidationError
-from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT
+from odoo.exceptions import UserError
+
+from .amazon_api_service import AmazonPAAPIService
 
 _logger = logging.getLogger(__name__)
 
+TRANSPORT_ERRORS = (requests.RequestException,) + ((httpx.HTTPError,) if httpx else ())
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36')
+
+# Session for helpers called without one; batch runs bring their own
+_shared_session = None
+_SHARED_SESSION_LOCK = threading.Lock()
+# HTTP/2 client multiplexing the Google and Bing search API calls, when httpx is available
+_search_client = None
+
+# Caps on concurrent requests per host family across worker threads
+_GOOGLE_API_SLOTS = threading.Semaphore(4)
+_IMAGE_DOWNLOAD_SLOTS = threading.Semaphore(8)
+
+# Batches flushed under their own savepoint between two commits
+COMMIT_EVERY_BATCHES = 10
+
+# Downloads are read in chunks and abandoned once they pass the size cap
+IMAGE_CHUNK_SIZE = 64 * 1024
+# (connect, read) seconds; the read timeout applies between chunks
+IMAGE_TIMEOUT = (5, 25)
+DEFAULT_MAX_IMAGE_MB = 5.0
+
+# Quality score lookup tables for _calculate_image_quality
+_RESOLUTION_THRESHOLDS = (200000, 500000, 1000000)  # Pixels: 0.2MP, 0.5MP, 1MP
+_RESOLUTION_SCORES = (10, 20, 30, 40)
+_FORMAT_SCORES = {'JPEG': 10, 'PNG': 10}
+
+# Image URLs are probed with HEAD before the full GET, except on these image
+# CDNs which always serve images and some of which reject HEAD
+PROBE_SKIP_HOSTS = (
+    'images-amazon.com',
+    'media-amazon.com',
+    'ssl-images-amazon.com',
+    'gstatic.com',
+    'googleusercontent.com',
+    'bing.net',
+)
+PROBE_TIMEOUT = 5
+# Enough of the file for PIL to read the image header
+PROBE_RANGE_BYTES = 256 * 1024
+
+_RE_CODE8 = re.compile(r'\b\d{8}\b')
+_RE_LONGCODE = re.compile(r'\b\d{5,}\b')
+_RE_WS = re.compile(r'\s+')
+_RE_WORD = re.compile(r'\w+')
+# Shop prefixes stripped from description snippets, each at most once and in this order
+_RE_SHOP_PREFIXES = re.compile(r'^(?:Buy )?(?:Shop )?(?:Get )?(?:Find )?')
+_NEWLINES_TABLE = str.maketrans({'\n': ' ', '\r': None})
+
+# Google and Bing search responses are reused within the process, by default
+# for a day; the configured lifetimes also keep them in the database
+SEARCH_CACHE_TTL = 86400
+SEARCH_CACHE_MAXSIZE = 4096
+
+# Image URLs rejected for their content type, size or dimensions, keyed with
+# the limits that applied; failed requests are not remembered
+REJECTED_URLS_TTL = 3600
+REJECTED_URLS_MAXSIZE = 4096
+# HTTP validators (ETag/Last-Modified) of stored images; repeat URLs are
+# fetched with a conditional GET and a 304 reuses the image already stored
+URL_VALIDATORS_TTL = 7 * 86400
+URL_VALIDATORS_MAXSIZE = 4096
+# Image URLs whose image is already stored, loaded from the database per batch
+# for the URLs its cached searches return; they are not downloaded again
+STORED_IMAGE_URLS_TTL = 86400
+STORED_IMAGE_URLS_MAXSIZE = 8192
+# Image info kept for a stored URL
+STORED_IMAGE_INFO_KEYS = ('width', 'height', 'format', 'size_bytes', 'checksum', 'quality_score', 'source_url')
+
+# Google Custom Search allows 100 queries per 100 seconds per key
+CSE_RATE = 1.0  # tokens per second
+CSE_BURST = 10
+
+# Backoff after a 429 without Retry-After: min(cap, 2**attempts) seconds with
+# +/-50% jitter, where attempts counts consecutive 429s for the same key
+RATE_LIMIT_MAX_ATTEMPTS = 8
+RATE_LIMIT_BACKOFF_CAP = 60
+
+
+class _TTLCache:
+    """Small thread-safe TTL cache shared by the worker threads"""
+
+    def __init__(self, ttl, maxsize):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                # Evict the oldest insertion
+                del self._data[next(iter(self._data))]
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+_SEARCH_CACHE = _TTLCache(SEARCH_CACHE_TTL, SEARCH_CACHE_MAXSIZE)
+_REJECTED_URLS = _TTLCache(REJECTED_URLS_TTL, REJECTED_URLS_MAXSIZE)
+_URL_VALIDATORS = _TTLCache(URL_VALIDATORS_TTL, URL_VALIDATORS_MAXSIZE)
+_STORED_IMAGE_URLS = _TTLCache(STORED_IMAGE_URLS_TTL, STORED_IMAGE_URLS_MAXSIZE)
+
+
+def _url_key(url):
+    """Hash identifying an image URL in the URL caches"""
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+
+def _cancelled(cancel):
+    """Whether a racing source was told to stop (``cancel`` is an Event or None)"""
+    return cancel is not None and cancel.is_set()
+
+
+def _image_limits(config):
+    """(max_bytes, min_width, min_height) an image must satisfy under a config"""
+    size_mb = getattr(config, 'max_image_size_mb', None) or getattr(config, 'max_image_size', None)
+    return (
+        int((size_mb or DEFAULT_MAX_IMAGE_MB) * 1024 * 1024),
+        getattr(config, 'min_image_width', 0) or 0,
+        getattr(config, 'min_image_height', 0) or 0,
+    )
+
+
+class _TokenBucket:
+    """Thread-safe token bucket that only blocks once its tokens run out"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._blocked_until:
+                    self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                else:
+                    wait = self._blocked_until - now
+            time.sleep(wait)
+
+    def penalize(self, seconds):
+        """Empty the bucket and hold it back for ``seconds``"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = 0.0
+            self._updated = max(now + seconds, self._updated)
+            self._blocked_until = max(self._blocked_until, now + seconds)
+
+
+_CSE_BUCKETS = {}
+_CSE_BUCKETS_LOCK = threading.Lock()
+
+_RATE_LIMIT_ATTEMPTS = {}
+_RATE_LIMIT_ATTEMPTS_LOCK = threading.Lock()
+
+
+def _cse_bucket(api_key):
+    """Return the token bucket of a Google API key, keyed by its hash"""
+    key_hash = hashlib.sha1((api_key or '').encode('utf-8')).hexdigest()
+    with _CSE_BUCKETS_LOCK:
+        bucket = _CSE_BUCKETS.get(key_hash)
+        if bucket is None:
+            bucket = _CSE_BUCKETS[key_hash] = _TokenBucket(CSE_RATE, CSE_BURST)
+        return bucket
+
+
+# (config_id, source) -> (requests_per_minute, bucket)
+_API_BUCKETS = {}
+
+
+def _api_bucket(config_id, source, requests_per_minute):
+    """Return the requests-per-minute bucket of a configuration's search API,
+    or None
+    
+    Each API gets its own budget. Rebuilt when the configured rate changes.
+    """
+    if not requests_per_minute or requests_per_minute <= 0:
+        return None
+    with _CSE_BUCKETS_LOCK:
+        # Compared on the configured integer, as rate * 60 does not round-trip
+        built_for, bucket = _API_BUCKETS.get((config_id, source), (None, None))
+        if built_for != requests_per_minute:
+            bucket = _TokenBucket(requests_per_minute / 60.0, min(requests_per_minute, CSE_BURST))
+            _API_BUCKETS[(config_id, source)] = (requests_per_minute, bucket)
+        return bucket
+
+
+def _normalize_query(query):
+    """Canonical form of a search query: lowercased, single-spaced
+    
+    The search APIs ignore case and spacing, so queries that only differ in
+    those share cache entries.
+    """
+    return _RE_WS.sub(' ', query or '').strip().lower()
+
+
+def _description_query(search_keywords):
+    """Web search query used to find a product's description"""
+    return f"{search_keywords} product description specifications"
+
+
+def _search_cache_key(source, params):
+    """Hash a search's source and parameters, ignoring which API key sends them"""
+    relevant = sorted(
+        (k, _normalize_query(v) if k == 'q' else v)
+        for k, v in params.items() if k != 'key'
+    )
+    return hashlib.sha1(json.dumps([source, relevant]).encode('utf-8')).hexdigest()
+
+
+@lru_cache(maxsize=4096)
+def _build_search_query(name, brand, category):
+    """Build the search query from a product's name, brand and category
+
+    Pure on its string inputs, so daily re-scans of unchanged products hit
+    the memo instead of re-running the regex cleanup.
+    """
+    keywords = []
+    
+    # Clean product name - remove internal codes and make more generic
+    if name:
+        # Remove common internal identifiers
+        name = _RE_CODE8.sub('', name)  # Remove 8-digit codes like 00002649
+        name = _RE_WS.sub(' ', name).strip()  # Clean extra spaces
+        
+        # If we have a brand, make sure it's in the search
+        if brand and brand.upper() not in name.upper():
+            keywords.append(f"{brand} {name}")
+        else:
+            keywords.append(name)
+    
+    # Add category for better context
+    if category and category != 'All':
+        if len(keywords) == 0 or category.lower() not in keywords[0].lower():
+            keywords.append(category)
+    
+    # Join and limit length
+    search_query = ' '.join(keywords[:2])  # Use top 2 elements
+    
+    # Add regional context for better Ecuador/Latin America results
+    if search_query and not any(term in search_query.lower() for term in ['ecuador', 'latina', 'tech', 'producto']):
+        # Don't add "Ecuador" to every search as it might be too restrictive
+        # The country parameters will handle geographic targeting
+        pass
+    
+    # Limit total length to avoid overly complex queries
+    if len(search_query) > 100:
+        search_query = search_query[:100].rsplit(' ', 1)[0]  # Cut at word boundary
+        
+    return search_query
+
+
+class _ImageHeader(namedtuple('_ImageHeader', 'format width height')):
+    """Format and dimensions read from an image header, shaped like a PIL image"""
+    __slots__ = ()
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# JPEG start-of-frame markers; DHT (C4), JPG (C8) and DAC (CC) share the range
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+def _probe_image_header(data):
+    """Read format, width and height from PNG/JPEG bytes without PIL
+    
+    Returns an _ImageHeader, or None for other formats and unparsable data.
+    """
+    if data[:8] == _PNG_SIGNATURE:
+        if len(data) < 24 or data[12:16] != b'IHDR':
+            return None
+        width, height = struct.unpack('>II', data[16:24])
+        return _ImageHeader('PNG', width, height) if width and height else None
+    
+    if data[:2] != b'\xff\xd8':
+        return None
+    # Walk the JPEG segments up to the start-of-frame
+    i = 2
+    end = len(data)
+    while i + 9 <= end:
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Markers without a payload
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9])
+            return _ImageHeader('JPEG', width, height) if width and height else None
+        if marker == 0xDA:  # Image data starts before any frame header
+            return None
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+
+# Snippets whose simhashes differ in fewer bits are treated as duplicates
+SIMHASH_BITS = 64
+SIMHASH_MAX_DISTANCE = 6
+
+
+def _simhash(text):
+    """64-bit simhash of a text over its lowercased word 3-grams"""
+    tokens = _RE_WORD.findall(text.lower())
+    shingles = [' '.join(tokens[i:i + 3]) for i in range(max(len(tokens) - 2, 1))]
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if (h >> bit) & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+# Order in which image sources are tried
+IMAGE_SOURCE_ORDER = ('amazon', 'google', 'bing')
+# Racing the sources can spend a search call per source on every product, so
+# it is only done when the configured rate allows it (0 means unlimited)
+RACE_MIN_REQUESTS_PER_MINUTE = 120
+
+
+def _amazon_item_id(identifiers):
+    """(ItemIdType, value) Amazon can look a product up by, or None
+    
+    Only 12/13-digit barcodes (UPC-A/EAN-13) identify an item reliably.
+    """
+    barcode = identifiers.get('barcode') or ''
+    if barcode.isdigit() and len(barcode) in (12, 13):
+        return ('UPC' if len(barcode) == 12 else 'EAN'), barcode
+    return None
+
+
+def _job_fetch_key(job):
+    """Key of everything a product job's fetch depends on
+    
+    Jobs with equal keys get the same result, so it is fetched once for all.
+    """
+    return (
+        job['search_keywords'],
+        job['sources'],
+        job['needs_image'],
+        job['needs_description'],
+        _amazon_item_id(job['identifiers']) if 'amazon' in job['sources'] else None,
+    )
+
+
+# ORM-free view of a product handed to worker threads
+ProductRef = namedtuple('ProductRef', 'id name')
+
+
+class _StoredImage(namedtuple('_StoredImage', 'checksum')):
+    """Stands in for image bytes already stored, for a URL with a tracking
+    attachment or one the server reported unchanged (HTTP 304)
+    
+    The bytes are read back from the attachment with that checksum on the
+    main thread, in _apply_product_result, which downloads the URL again
+    when there is none.
+    """
+    __slots__ = ()
+
+
+class BatchWrites:
+    """ORM writes collected while a batch is applied, flushed once at its end
+    
+    Product values are merged per product so each product gets a single
+    write; log entries and attachments are each created with one create().
+    """
+
+    def __init__(self, known_checksums=None):
+        self.logs = []
+        self.attachments = []
+        self.product_vals = {}
+        # (product_id, url_key, image_info, validators) of the images saved
+        # from a URL; validators is the (etag, last_modified) pair or None
+        self.image_urls = []
+        # Checksums of stored product images, shared across the run's batches;
+        # None when deduplication is off
+        self.known_checksums = known_checksums
+
+    def add_product_vals(self, product_id, vals):
+        """Queue field values to write on a product"""
+        self.product_vals.setdefault(product_id, {}).update(vals)
+
+    def mark(self):
+        """Position to roll back to with discard()"""
+        return len(self.logs), len(self.attachments), len(self.image_urls)
+
+    def discard(self, product_id, mark):
+        """Drop what was queued for a product since mark()"""
+        del self.logs[mark[0]:]
+        del self.attachments[mark[1]:]
+        del self.image_urls[mark[2]:]
+        self.product_vals.pop(product_id, None)
+
+
+class ConfigSnapshot:
+    """Plain copy of the configuration used by fetchers in worker threads
+    
+    The ORM is not thread-safe, so worker threads read settings from this
+    object instead of the product.image.config record. It mirrors the config
+    methods the fetchers call; Google key rotation is tracked under a lock and
+    written back to the record on the main thread with sync_to(). It is built
+    once per run, so per-product code does not go back to the record either.
+    """
+
+    def __init__(self, config, sources=None):
+        self.use_google_images = config.use_google_images
+        self.auto_generate_descriptions = config.auto_generate_descriptions
+        self.process_products_with_images = config.process_products_with_images
+        # Image sources that are both enabled and fully configured
+        self.sources = dict(sources or {})
+        self.pipeline = tuple(source for source in IMAGE_SOURCE_ORDER if self.sources.get(source))
+        self.race_sources = (
+            not config.requests_per_minute or config.requests_per_minute >= RACE_MIN_REQUESTS_PER_MINUTE
+        )
+        # Caps on calls per search API, shared by all worker threads and by
+        # runs of the same configuration in this process; Amazon's client
+        # enforces its own rate
+        self.api_buckets = {
+            source: _api_bucket(config.id, source, config.requests_per_minute)
+            for source in ('google', 'bing')
+        }
+        self.google_search_engine_id = config.google_search_engine_id
+        self.search_cache_version = config.search_cache_version
+        self.search_cache_days = config.search_cache_days
+        self.description_cache_hours = config.description_cache_hours
+        # Search responses fetched during the run, saved by the main thread
+        self._new_searches = {}
+        self.bing_api_key = config.bing_api_key
+        self.max_image_size_mb = config.max_image_size_mb or config.max_image_size
+        self.min_image_width = config.min_image_width
+        self.min_image_height = config.min_image_height
+        self.current_api_key_index = config.current_api_key_index
+        self._google_api_keys = config.get_available_google_api_keys()
+        self._lock = threading.Lock()
+
+    def get_available_google_api_keys(self):
+        """Get list of available Google API keys"""
+        return list(self._google_api_keys)
+
+    def get_current_google_api_key(self):
+        """Get the current Google API key for use"""
+        with self._lock:
+            if not self._google_api_keys:
+                return None
+            if self.current_api_key_index >= len(self._google_api_keys):
+                self.current_api_key_index = 0
+            return self._google_api_keys[self.current_api_key_index]
+
+    def rotate_google_api_key(self, reason="Rate limit"):
+        """Rotate to the next available Google API key"""
+        with self._lock:
+            keys = self._google_api_keys
+            if len(keys) <= 1:
+                return False
+            old_index = self.current_api_key_index
+            self.current_api_key_index = (self.current_api_key_index + 1) % len(keys)
+        _logger.info(f"API Key Rotation - Reason: {reason}, Index: {old_index} -> {self.current_api_key_index}, "
+                     f"Key: ...{keys[self.current_api_key_index][-8:]}")
+        return True
+
+    def record_search(self, cache_key, data, ttl):
+        """Queue a search response to be saved in the database cache"""
+        with self._lock:
+            self._new_searches[cache_key] = (data, ttl)
+
+    def pop_searches(self):
+        """Return and forget the search responses queued so far"""
+        with self._lock:
+            searches, self._new_searches = self._new_searches, {}
+        return searches
+
+    def sync_to(self, config):
+        """Persist the rotated key index on the config record (main thread only)"""
+        if config.current_api_key_index != self.current_api_key_index:
+            config.current_api_key_index = self.current_api_key_index
+
 
 class ProductImageFetcher(models.TransientModel):
     _name = 'product.image.fetcher'
     _description = 'Product Image Fetcher Service'
+    
+    # Google Custom Search endpoint and the query parameters every search shares
+    _GOOGLE_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+    _GOOGLE_BASE_PARAMS = MappingProxyType({
+        'safe': 'active',
+        'gl': 'ec',  # Ecuador geolocation
+        'hl': 'es',  # Spanish language
+    })
+    _GOOGLE_IMAGE_PARAMS = MappingProxyType({
+        **_GOOGLE_BASE_PARAMS,
+        'searchType': 'image',
+        'imgSize': 'medium',  # Less restrictive than 'large'
+    })
+    _BING_SEARCH_URL = "https://api.cognitive.microsoft.com/bing/v7.0/images/search"
+    _BING_IMAGE_PARAMS = MappingProxyType({
+        'imageType': 'Photo',
+        'size': 'Large',
+        'count': 3,
+    })
 
     def _get_session(self):
-        """Get a requests session with proper headers"""
+        """Build a new requests session with proper headers and a connection pool
+        
+        Every call creates a session, so callers must reuse it: batch runs
+        build one and pass it down so keep-alive connections to the search
+        APIs and image CDNs are reused across products, and other helpers use
+        _get_shared_session.
+        """
         session = requests.Session()
-        session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        })
+        # requests already advertises gzip/deflate, and br when brotli is installed
+        session.headers['User-Agent'] = USER_AGENT
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.5,
+                status_forcelist=(500, 502, 503, 504),
+                allowed_methods=frozenset(['GET']),
+            ),
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
         return session
 
-    def _handle_rate_limit(self, response, operation="API call", config=None):
-        """Handle rate limit errors with API key rotation and exponential backoff"""
-        if response.status_code == 429:
-            _logger.warning(f"Rate limit hit for {operation}")
+    def _get_shared_session(self):
+        """Get the process-wide session used by helpers called outside a batch
+        
+        Built on first use and kept open, so one-off fetches (manual actions,
+        tests) reuse its connections instead of opening a new session per call.
+        """
+        global _shared_session
+        if _shared_session is None:
+            with _SHARED_SESSION_LOCK:
+                if _shared_session is None:
+                    _shared_session = self._get_session()
+        return _shared_session
+
+    def _get_search_client(self):
+        """Get the process-wide HTTP/2 client for the search APIs, or None
+        
+        Concurrent Google Custom Search and Bing searches share one
+        multiplexed connection per host instead of one connection each. Only
+        built when httpx (with h2) is installed; image downloads keep using
+        the requests session, as CDNs vary.
+        """
+        global _search_client
+        if httpx is None:
+            return None
+        if _search_client is None:
+            with _SHARED_SESSION_LOCK:
+                if _search_client is None:
+                    _search_client = httpx.Client(
+                        transport=httpx.HTTPTransport(
+                            http2=True,
+                            retries=3,
+                            limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+                        ),
+                        headers={'User-Agent': USER_AGENT},
+                    )
+        return _search_client
+
+    def _handle_rate_limit(self, response, operation="API call", config=None, key=None, bucket=None):
+        """Handle rate limit errors with API key rotation and exponential backoff
+        
+        ``key`` identifies the API key that was throttled. Consecutive 429s for
+        the same key back off exponentially with jitter, and ``bucket``, the
+        token bucket the key draws from, is held back for the wait. Returns
+        True when the call should be retried.
+        """
+        if response.status_code != 429:
+            if key and response.status_code == 200:
+                with _RATE_LIMIT_ATTEMPTS_LOCK:
+                    _RATE_LIMIT_ATTEMPTS.pop(key, None)
+            return False
+        
+        _logger.warning(f"Rate limit hit for {operation}")
+        
+        with _RATE_LIMIT_ATTEMPTS_LOCK:
+            attempts = _RATE_LIMIT_ATTEMPTS.get(key, 0)
+            _RATE_LIMIT_ATTEMPTS[key] = attempts + 1
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            wait_time = int(retry_after)
+        else:
+            wait_time = min(RATE_LIMIT_BACKOFF_CAP, 2 ** attempts) * random.uniform(0.5, 1.5)
+        
+        if bucket is not None:
+            # Hold this key back for the other workers too
+            bucket.penalize(wait_time)
+        
+        # Try to rotate API key if available and it's a Google API call
+        if config and "Google" in operation:
+            if config.rotate_google_api_key(f"Rate limit during {operation}"):
+                _logger.info(f"Switched to next API key, retrying immediately")
+                return True  # Indicate retry without waiting
+            else:
+                _logger.warning(f"No alternative API keys available, using backoff")
+        
+        # Fallback to wait strategy
+        _logger.warning(f"Waiting {wait_time:.1f} seconds before retry...")
+        time.sleep(wait_time)
+        return True
+
+    def _throttle(self, config, source):
+        """Wait for a search API's requests-per-minute budget, if there is one"""
+        bucket = (getattr(config, 'api_buckets', None) or {}).get(source)
+        if bucket is not None:
+            bucket.acquire()
+
+    def _cse_get(self, session, url, params, config, operation, timeout=30):
+        """GET a Google Custom Search URL, moving on to the next key on 429
+        
+        Each attempt uses the key current at that time, so a rotation in
+        _handle_rate_limit is picked up by the next pass of the loop. Returns
+        the first response that is not a 429, or the last one.
+        """
+        client = self._get_search_client() or session
+        for attempt in range(RATE_LIMIT_MAX_ATTEMPTS):
+            if attempt:
+                params['key'] = config.get_current_google_api_key()
+                _logger.info(f"Retrying {operation} with API key #{config.current_api_key_index + 1}")
             
-            # Try to rotate API key if available and it's a Google API call
-            if config and "Google" in operation:
-                if config.rotate_google_api_key(f"Rate limit during {operation}"):
-                    _logger.info(f"Switched to next API key, retrying immediately")
-                    return True  # Indicate retry without waiting
-                else:
-                    _logger.warning(f"No alternative API keys available, using backoff")
+            self._throttle(config, 'google')
+            _cse_bucket(params['key']).acquire()
+            with _GOOGLE_API_SLOTS:
+                response = client.get(url, params=params, timeout=timeout)
             
-            # Fallback to wait strategy
-            retry_after = response.headers.get('Retry-After')
-            if retry_after:
-                wait_time = int(retry_after)
-            else:
-                wait_time = 20
+            # Give up on the last attempt rather than waiting for nothing
+            if attempt == RATE_LIMIT_MAX_ATTEMPTS - 1:
+                break
+            if not self._handle_rate_limit(response, operation, config, key=params['key'],
+                                           bucket=_cse_bucket(params['key'])):
+                break
+            response.close()  # Hand the connection back before retrying
+        return response
+
+    def _bing_get(self, client, params, config):
+        """GET a Bing image search, backing off and retrying on 429
+        
+        The wait also holds back the configuration's Bing bucket, so the
+        other workers pause too. Returns the first response that is not a
+        429, or the last one.
+        """
+        bucket = (getattr(config, 'api_buckets', None) or {}).get('bing')
+        headers = {'Ocp-Apim-Subscription-Key': config.bing_api_key}
+        for attempt in range(RATE_LIMIT_MAX_ATTEMPTS):
+            self._throttle(config, 'bing')
+            response = client.get(self._BING_SEARCH_URL, params=params, headers=headers, timeout=30)
             
-            _logger.warning(f"Waiting {wait_time} seconds before retry...")
-            time.sleep(wait_time)
-            return True
-        return False
+            # Give up on the last attempt rather than waiting for nothing
+            if attempt == RATE_LIMIT_MAX_ATTEMPTS - 1:
+                break
+            if not self._handle_rate_limit(response, "Bing Image Search", key=config.bing_api_key, bucket=bucket):
+                break
+            response.close()  # Hand the connection back before retrying
+        return response
+
+    def _cache_search(self, cache_key, data, config, ttl):
+        """Keep a search response in memory and, in batch runs, queue it for
+        the database cache"""
+        if ttl <= 0:
+            return
+        _SEARCH_CACHE.set(cache_key, data, ttl)
+        record_search = getattr(config, 'record_search', None)
+        if record_search is not None:
+            record_search(cache_key, data, ttl)
+
+    def _google_image_params(self, api_key, config, query, num=5):
+        """Query parameters of a Google image search; ``num`` results to choose from"""
+        return {
+            **self._GOOGLE_IMAGE_PARAMS,
+            'key': api_key,
+            'cx': config.google_search_engine_id,
+            'q': query,
+            'num': num,
+        }
+
+    def _google_description_params(self, api_key, config, search_keywords):
+        """Query parameters of the Google web search for a product's description"""
+        return {
+            **self._GOOGLE_BASE_PARAMS,
+            'key': api_key,
+            'cx': config.google_search_engine_id,
+            'q': _description_query(search_keywords),
+            'num': 5,  # Get multiple results for better description
+        }
+
+    def _bing_image_params(self, search_keywords):
+        """Query parameters of a Bing image search"""
+        return {**self._BING_IMAGE_PARAMS, 'q': search_keywords}
+
+    def _job_search_cache_keys(self, job, config):
+        """Cache keys of the searches a product job starts with, as
+        (image_search_keys, description_search_keys)
+        
+        Fallback searches only run after an empty search, so they are left out.
+        """
+        keywords = job['search_keywords']
+        image_keys = []
+        if job['needs_image'] and 'google' in job['sources']:
+            image_keys.append(_search_cache_key('google', self._google_image_params(None, config, keywords)))
+        if job['needs_image'] and 'bing' in job['sources']:
+            image_keys.append(_search_cache_key('bing', self._bing_image_params(keywords)))
+        description_keys = []
+        if job['needs_description']:
+            description_keys.append(_search_cache_key('google', self._google_description_params(None, config, keywords)))
+        return image_keys, description_keys
+
+    def _cached_cse(self, session, url, params, config, operation, timeout=30, ttl=SEARCH_CACHE_TTL):
+        """Run a Google Custom Search query, serving repeats from the cache
+        
+        Returns the decoded JSON payload, or None when the API did not answer
+        with 200. Cache hits skip both the request and the rate limiter; misses
+        only wait when the key's token bucket is empty. Responses are kept for
+        ``ttl`` seconds.
+        """
+        cache_key = _search_cache_key('google', params)
+        data = _SEARCH_CACHE.get(cache_key)
+        if data is not None:
+            _logger.debug("%s: served '%s' from cache", operation, params.get('q'))
+            return data
+        
+        response = self._cse_get(session, url, params, config, operation, timeout)
+        if response.status_code != 200:
+            _logger.warning(f"{operation} returned status {response.status_code}: {response.text}")
+            return None
+        
+        data = response.json()
+        self._cache_search(cache_key, data, config, ttl)
+        return data
 
     @api.model
     def run_daily_scan(self):
@@ -81,11 +821,15 @@ class ProductImageFetcher(models.TransientModel):
             
             _logger.info(f"Found {len(products_without_images)} products needing images")
             
-            # Process in batches
-            self._process_products_in_batches(products_without_images, config, batch_id, 'daily')
+            # Process in batches, through queue jobs when available
+            if not self._enqueue_products(products_without_images, config, batch_id, 'daily'):
+                self._process_products_in_batches(products_without_images, config, batch_id, 'daily')
             
             # Cleanup old logs
             self.env['product.image.log'].cleanup_old_logs(config.log_retention_days)
+            self.env['product.image.negative.cache'].cleanup_expired()
+            self.env['product.image.search.cache'].cleanup_expired()
+            self.env['product.image.url.cache'].cleanup_expired()
             
         except Exception as e:
             _logger.error(f"Error in daily scan: {str(e)}", exc_info=True)
@@ -105,13 +849,22 @@ class ProductImageFetcher(models.TransientModel):
             
             batch_id = f"backfill_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
             
-            # Find all products that could use images/descriptions
-            all_products = self.env['product.template'].search([('sale_ok', '=', True)])
+            # Find all products that could use images/descriptions; complete
+            # products are left out in the query rather than skipped one by one
+            domain = [('sale_ok', '=', True), ('image_auto_fetch_enabled', '=', True)]
+            if config.auto_generate_descriptions:
+                domain += ['|', ('image_missing', '=', True), ('description_sale', '=', False)]
+            else:
+                domain.append(('image_missing', '=', True))
+            all_products = self.env['product.template'].search(
+                domain, limit=self._get_scan_limit(config), order='id'
+            )
             
             _logger.info(f"Backfill job processing {len(all_products)} products")
             
-            # Process in batches  
-            self._process_products_in_batches(all_products, config, batch_id, 'backfill', force_update=False)
+            # Process in batches, through queue jobs when available
+            if not self._enqueue_products(all_products, config, batch_id, 'backfill'):
+                self._process_products_in_batches(all_products, config, batch_id, 'backfill', force_update=False)
             
         except Exception as e:
             _logger.error(f"Error in backfill job: {str(e)}", exc_info=True)
@@ -132,146 +885,608 @@ class ProductImageFetcher(models.TransientModel):
         
         return self._process_products_in_batches(products, config, batch_id, job_type, force_update)
 
+    def _enqueue_products(self, products, config, batch_id, job_type, force_update=False):
+        """Split a run into queue jobs when OCA queue_job is installed
+        
+        Each chunk of batch_size products becomes one job on the
+        root.image_fetch channel, so the queue's workers run chunks in
+        parallel and retry failed ones. Returns False, enqueueing nothing,
+        when queue_job is not available.
+        
+        The requests-per-minute buckets are per process, so N jobs running at
+        once may send N times the configured rate; give the channel a
+        capacity of 1 to keep the configured limit.
+        """
+        if 'queue.job' not in self.env:
+            return False
+        chunk_size = config.batch_size or 50
+        for i in range(0, len(products), chunk_size):
+            chunk = products[i:i + chunk_size]
+            self.with_delay(
+                channel='root.image_fetch', priority=10,
+                description=f"Fetch product images ({batch_id}, {len(chunk)} products)",
+            )._process_product_ids(chunk.ids, batch_id, job_type, force_update)
+        _logger.info(f"Enqueued {len(products)} products in chunks of {chunk_size} for {batch_id}")
+        return True
+
+    def _process_product_ids(self, product_ids, batch_id, job_type, force_update=False):
+        """Queue job entry point: process the products with these ids"""
+        config = self.env['product.image.config'].get_active_config()
+        if not config:
+            _logger.error("No active configuration found for queued image fetch")
+            return False
+        products = self.env['product.template'].browse(product_ids).exists()
+        return self._process_products_in_batches(products, config, batch_id, job_type, force_update)
+
     def _get_products_needing_images(self, config):
         """Get products that need images based on configuration"""
-        domain = [('sale_ok', '=', True)]
+        domain = [('sale_ok', '=', True), ('image_auto_fetch_enabled', '=', True)]
         
         # Add conditions based on config
         if not config.process_products_with_images:
-            domain.append(('image_1920', '=', False))
+            domain.append(('image_missing', '=', True))
         
-        products = self.env['product.template'].search(domain, limit=config.batch_size or 50)
+        products = self.env['product.template'].search(
+            domain, limit=self._get_scan_limit(config, config.batch_size or 50), order='id desc'
+        )  # Newest first: recently created products are the likeliest to lack images
         return products
 
+    def _prefetch_product_data(self, products):
+        """Load the product fields a run reads, a few queries for all products
+        
+        Covers the related names used to build search keywords, which the
+        ORM would otherwise fetch per product.
+        """
+        products.read(['name', 'barcode', 'default_code', 'description', 'description_sale',
+                       'image_fetch_attempts', 'categ_id'])
+        products.mapped('categ_id.name')
+        if 'brand_id' in products._fields:
+            products.mapped('brand_id.name')
+
+    def _get_product_image_checksums(self):
+        """Checksums of the images already stored for products, in one query"""
+        attachments = self.env['ir.attachment'].sudo().search_read([
+            ('res_model', '=', 'product.template'),
+            ('checksum', '!=', False),
+            '|', ('res_field', '=', False), ('res_field', '=', 'image_1920'),
+        ], ['checksum'])
+        return {attachment['checksum'] for attachment in attachments}
+
+    def _is_duplicate_image(self, checksum, config, pending=None):
+        """Whether an identical image is already stored for a product"""
+        if not config.enable_deduplication:
+            return False
+        if pending is not None and pending.known_checksums is not None:
+            if checksum in pending.known_checksums:
+                return True
+            pending.known_checksums.add(checksum)  # Catch duplicates later in the run
+            return False
+        return bool(self.env['ir.attachment'].sudo().search_count([
+            ('res_model', '=', 'product.template'),
+            ('checksum', '=', checksum),
+            '|', ('res_field', '=', False), ('res_field', '=', 'image_1920'),
+        ], limit=1))
+
+    def _get_scan_limit(self, config, default=None):
+        """Number of products a scan may load; test mode caps it in the query"""
+        if config.test_mode and config.test_product_limit:
+            return config.test_product_limit
+        return default
+
+    def _get_product_ids_with_images(self, products):
+        """Return the ids of products that have an image
+        
+        Reads the attachment index instead of image_1920 itself, so the image
+        data is not loaded just to test whether it is set.
+        """
+        if not products:
+            return set()
+        attachments = self.env['ir.attachment'].sudo().search_read([
+            ('res_model', '=', products._name),
+            ('res_field', '=', 'image_1920'),
+            ('res_id', 'in', products.ids),
+        ], ['res_id'])
+        return {attachment['res_id'] for attachment in attachments}
+
     def _process_products_in_batches(self, products, config, batch_id, job_type, force_update=False):
-        """Process products in smaller batches to avoid timeouts"""
+        """Process products in smaller batches to avoid timeouts
+        
+        The HTTP work for the products of a batch runs concurrently on a thread
+        pool; everything touching the ORM (preparing jobs, saving results,
+        commits) stays on the main thread.
+        """
         batch_size = min(config.batch_size or 10, 10)  # Max 10 per batch
+        max_workers = max(1, min(config.max_concurrency or batch_size, batch_size))
+        snapshot = ConfigSnapshot(config, self._get_enabled_sources(config))
+        # Racing sources and description searches run as extra tasks on the
+        # same pool, so it has room for them next to the products
+        tasks_per_product = len(snapshot.pipeline) if snapshot.race_sources and len(snapshot.pipeline) > 1 else 1
+        if config.auto_generate_descriptions:
+            tasks_per_product += 1
+        max_workers *= tasks_per_product
+        NegativeCache = self.env['product.image.negative.cache']
+        query_hash = NegativeCache._query_hash
+        known_checksums = self._get_product_image_checksums() if config.enable_deduplication else None
+        self._prefetch_product_data(products)
         
-        for i in range(0, len(products), batch_size):
-            batch = products[i:i + batch_size]
-            _logger.info(f"Processing batch {i//batch_size + 1} with {len(batch)} products")
-            
-            for product in batch:
-                try:
-                    self._process_single_product(product, config, batch_id, job_type, force_update)
-                    self.env.cr.commit()  # Commit after each product
+        # One pooled session for the whole run so connections are reused, and
+        # one Amazon client so its signing key and connections are too
+        session = self._get_session()
+        amazon = self._get_amazon_service(config) if snapshot.sources.get('amazon') else None
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for i in range(0, len(products), batch_size):
+                    batch = products[i:i + batch_size]
+                    _logger.info(f"Processing batch {i//batch_size + 1} with {len(batch)} products")
                     
-                    # Add delay between products to avoid overwhelming APIs
-                    time.sleep(2)
+                    with_images = self._get_product_ids_with_images(batch)
+                    jobs = []
+                    for product in batch:
+                        try:
+                            job = self._prepare_product_job(
+                                product, snapshot, force_update, has_image=product.id in with_images
+                            )
+                        except Exception as e:
+                            _logger.error(f"Error preparing product {product.id}: {str(e)}", exc_info=True)
+                            continue
+                        if job:
+                            jobs.append((product, job))
                     
-                except Exception as e:
-                    _logger.error(f"Error processing product {product.id}: {str(e)}", exc_info=True)
-                    self.env.cr.rollback()
-                    continue
+                    # Skip Google image and description searches that found
+                    # nothing usable within the last days
+                    for product, job in jobs:
+                        job['negative_key'], job['description_negative_key'] = (
+                            query_hash(_normalize_query(query), snapshot.google_search_engine_id,
+                                       snapshot.search_cache_version)
+                            for query in (job['search_keywords'], _description_query(job['search_keywords']))
+                        )
+                    known_empty = NegativeCache._get_known_empty(
+                        {key for product, job in jobs for key in (job['negative_key'], job['description_negative_key'])}
+                    )
+                    for product, job in jobs:
+                        if job['negative_key'] in known_empty:
+                            _logger.debug("Skipping Google for product %s - search found nothing recently", product.id)
+                            job['sources'] = tuple(source for source in job['sources'] if source != 'google')
+                        if job['needs_description'] and job['description_negative_key'] in known_empty:
+                            _logger.debug("Skipping description for product %s - search found nothing recently", product.id)
+                            job['needs_description'] = False
+                    
+                    image_search_keys, description_search_keys = set(), set()
+                    for product, job in jobs:
+                        image_keys, description_keys = self._job_search_cache_keys(job, snapshot)
+                        image_search_keys.update(image_keys)
+                        description_search_keys.update(description_keys)
+                    self._load_search_cache(image_search_keys | description_search_keys)
+                    self._load_url_cache(image_search_keys)
+                    
+                    # Products of the batch that would run the same searches (e.g.
+                    # variants sharing a name) share a single fetch
+                    fetches = {}
+                    futures = []
+                    for product, job in jobs:
+                        fetch_key = _job_fetch_key(job)
+                        if fetch_key not in fetches:
+                            fetches[fetch_key] = executor.submit(
+                                self._process_single_product, job, snapshot, session, amazon, executor
+                            )
+                        futures.append(fetches[fetch_key])
+                    
+                    # Product writes and log rows are flushed once per batch; a
+                    # savepoint per product keeps one failure from undoing the rest
+                    pending = BatchWrites(known_checksums)
+                    empty_searches = set()
+                    for (product, job), future in zip(jobs, futures):
+                        mark = pending.mark()
+                        try:
+                            result = future.result()
+                            if result['google_empty']:
+                                empty_searches.add(job['negative_key'])
+                            if result['description_empty']:
+                                empty_searches.add(job['description_negative_key'])
+                            with self.env.cr.savepoint():
+                                self._apply_product_result(product, result, config, batch_id, job_type, pending)
+                            
+                        except Exception as e:
+                            _logger.error(f"Error processing product {product.id}: {str(e)}", exc_info=True)
+                            pending.discard(product.id, mark)  # Its changes were rolled back
+                            self._log_operation(
+                                pending, product.id, 'error', 'failed', f"Processing failed: {str(e)}",
+                                batch_id=batch_id, job_type=job_type
+                            )
+                            continue
+                    
+                    # A failed flush only rolls back its own savepoint, so the
+                    # batches before it still get committed
+                    batch_number = i // batch_size + 1
+                    try:
+                        with self.env.cr.savepoint():
+                            self._flush_batch_writes(pending, batch_id, job_type)
+                    except Exception as e:
+                        _logger.error(f"Error saving batch {batch_number}: {str(e)}", exc_info=True)
+                        pending.image_urls = []  # Their attachments were rolled back
+                    
+                    # The caches and the config row are shared with concurrent
+                    # runs, e.g. parallel queue jobs; losing a race on them must
+                    # not undo the products saved above
+                    try:
+                        with self.env.cr.savepoint():
+                            self._flush_batch_caches(pending, empty_searches, snapshot)
+                    except Exception as e:
+                        _logger.warning(f"Could not update the caches for batch {batch_number}: {str(e)}")
+                    try:
+                        with self.env.cr.savepoint():
+                            snapshot.sync_to(config)
+                    except Exception as e:
+                        _logger.warning(f"Could not save the current API key index: {str(e)}")
+                    
+                    last_batch = i + batch_size >= len(products)
+                    if self._can_commit() and (last_batch or batch_number % COMMIT_EVERY_BATCHES == 0):
+                        self.env.cr.commit()
+        finally:
+            session.close()
+            if amazon is not None:
+                amazon.close()
         
         return True
 
-    def _process_single_product(self, product, config, batch_id, job_type, force_update=False):
-        """Process a single product for image and description fetching"""
-        start_time = time.time()
+    def _can_commit(self):
+        """Whether batches may be committed as they finish
+        
+        Queue jobs (job_uuid in the context) own their transaction, so there
+        the batches only close a savepoint and the job commits at the end.
+        """
+        return not self.env.context.get('job_uuid')
+
+    def _load_search_cache(self, cache_keys):
+        """Load the cached responses of a batch's searches into memory
+        
+        Worker threads cannot read the database, so each batch starts with
+        its stored responses in the in-process cache. Keys already held in
+        memory are not read again.
+        """
+        missing = [key for key in cache_keys if _SEARCH_CACHE.get(key) is None]
+        if not missing:
+            return
+        entries = self.env['product.image.search.cache']._get_valid(missing)
+        for cache_key, (data, ttl) in entries.items():
+            _SEARCH_CACHE.set(cache_key, data, ttl)
+        _logger.debug("Loaded %s cached search responses", len(entries))
+
+    def _load_url_cache(self, search_keys):
+        """Load the stored-image entries of a batch's candidate URLs into memory
         
-        _logger.info(f"Processing product: {product.name} (ID: {product.id})")
+        The candidates are the image URLs of the batch's cached image searches;
+        workers then skip downloading those already stored. URLs of searches
+        not cached yet cannot be known before the search runs.
+        """
+        url_keys = set()
+        for search_key in search_keys:
+            data = _SEARCH_CACHE.get(search_key) or {}
+            # Google image results link the image; Bing gives its contentUrl
+            for item in data.get('items') or data.get('value') or ():
+                url = item.get('link') or item.get('contentUrl')
+                if url:
+                    url_keys.add(_url_key(url))
+        missing = [url_key for url_key in url_keys if _STORED_IMAGE_URLS.get(url_key) is None]
+        if not missing:
+            return
+        entries = self.env['product.image.url.cache']._get_recent(missing)
+        for url_key, info in entries.items():
+            _STORED_IMAGE_URLS.set(url_key, info)
+        _logger.debug("Loaded %s stored image URLs", len(entries))
+
+    def _prepare_product_job(self, product, config, force_update=False, has_image=None):
+        """Read everything a worker needs for one product (main thread)
+        
+        ``config`` is the run's ConfigSnapshot. ``has_image`` may be given when
+        already known, which avoids reading image_1920. Returns None when the
+        product needs neither an image nor a description.
+        """
+        if has_image is None:
+            has_image = product.has_product_image()
         
         # Determine what needs to be processed
-        needs_image = not product.image_1920 or (force_update and config.process_products_with_images)
+        needs_image = not has_image or (force_update and config.process_products_with_images)
         needs_description = config.auto_generate_descriptions and not product.description_sale
         
         # Skip if nothing needs to be done
         if not needs_image and not needs_description:
-            _logger.info(f"Skipping product {product.id} - has image and description")
-            return
+            _logger.debug("Skipping product %s - has image and description", product.id)
+            return None
         
-        # Prepare search keywords if we need to fetch anything
-        search_keywords = self._prepare_search_keywords(product)
         identifiers = self._extract_product_identifiers(product)
+        return {
+            'product': ProductRef(product.id, product.name),
+            'needs_image': needs_image,
+            'needs_description': needs_description,
+            'search_keywords': self._prepare_search_keywords(product),
+            'identifiers': identifiers,
+            # Amazon is only worth asking with an identifier; keywords go to the search engines
+            'sources': tuple(
+                source for source in config.pipeline
+                if source != 'amazon' or _amazon_item_id(identifiers)
+            ),
+        }
+
+    def _process_single_product(self, job, config, session=None, amazon=None, executor=None):
+        """Fetch image and description data for a prepared product job
         
-        _logger.info(f"Search keywords: {search_keywords} (needs_image: {needs_image}, needs_description: {needs_description})")
+        Runs in a worker thread: only HTTP work happens here and the ORM must
+        not be touched. ``config`` is a ConfigSnapshot and ``executor`` the
+        run's thread pool, used to race the image sources and to search the
+        description alongside them. The returned dict is saved by
+        _apply_product_result on the main thread.
+        """
+        start_time = time.perf_counter()
+        product = job['product']
+        search_keywords = job['search_keywords']
+        needs_image = job['needs_image']
+        needs_description = job['needs_description']
+        
+        _logger.debug("Processing product: %s (ID: %s)", product.name, product.id)
+        _logger.debug("Search keywords: %s (needs_image: %s, needs_description: %s)",
+                      search_keywords, needs_image, needs_description)
         
         # Initialize result containers
         image_data = None
         image_info = {}
         description_data = {}
+        google_empty = False
+        description_empty = False
         
-        # Only try to fetch images if needed
-        if needs_image:
-            # 1. Try Amazon first if configured
-            if config.use_amazon_api and self._has_amazon_config(config):
-                _logger.info("Trying Amazon...")
-                image_data, image_info = self._fetch_from_amazon(product, identifiers, search_keywords, config)
-            
-            # 2. Try Google Images if no image found and configured
-            if not image_data and config.use_google_images and self._has_google_config(config):
-                _logger.info("Trying Google Images...")
-                image_data, image_info = self._fetch_from_google(product, search_keywords, config)
-            
-            # 3. Try Bing if still no image and configured
-            if not image_data and config.use_bing_images and self._has_bing_config(config):
-                _logger.info("Trying Bing...")
-                image_data, image_info = self._fetch_from_bing(product, search_keywords, config)
+        # The description search is independent of the images, so when both
+        # are needed it runs alongside the image sources
+        description_future = None
+        if executor is not None and needs_description and needs_image and job['sources']:
+            description_future = executor.submit(
+                self._fetch_description_from_google, product, search_keywords, config, session
+            )
+        
+        # Only try to fetch images if needed; with enough rate budget all
+        # sources are queried at once, otherwise they run in order until one hits
+        if needs_image and executor is not None and config.race_sources and len(job['sources']) > 1:
+            image_data, image_info, google_empty = self._race_image_sources(job, config, session, amazon, executor)
+        else:
+            for source in (job['sources'] if needs_image else ()):
+                _logger.debug("Trying %s...", source)
+                image_data, image_info = self._fetch_image_from(source, job, config, session, amazon)
+                if source == 'google':
+                    google_empty = image_info.pop('no_results', False)
+                if image_data:
+                    break
+        
+        # Fetch description if needed (independent of image processing); one
+        # the pool has not started yet runs here rather than wait for a thread
+        if description_future is not None and not description_future.cancel():
+            description_data = description_future.result()
+        elif needs_description:
+            _logger.debug("Fetching description from Google...")
+            description_data = self._fetch_description_from_google(product, search_keywords, config, session)
+        description_empty = description_data.pop('no_results', False)
+        
+        return {
+            'image_data': image_data,
+            'image_info': image_info,
+            'description_data': description_data,
+            'image_attempted': needs_image,
+            'google_empty': google_empty,
+            'description_empty': description_empty,
+            'start_time': start_time,
+        }
+
+    def _fetch_image_from(self, source, job, config, session=None, amazon=None, cancel=None):
+        """Fetch an image for a product job from one source (worker thread)
+        
+        ``cancel`` is the Event of a race; once set the source stops before
+        its next request or download chunk and returns no image.
+        """
+        product = job['product']
+        search_keywords = job['search_keywords']
+        if source == 'amazon':
+            return self._fetch_from_amazon(
+                product, job['identifiers'], search_keywords, config, session, amazon, cancel=cancel
+            )
+        if source == 'google':
+            return self._fetch_from_google(product, search_keywords, config, session, cancel=cancel)
+        return self._fetch_from_bing(product, search_keywords, config, session, cancel=cancel)
+
+    def _race_image_sources(self, job, config, session, amazon, executor):
+        """Query all of a job's sources concurrently and keep the first image
+        
+        The first source runs on the calling thread and the others as tasks on
+        the run's ``executor``. Once an image arrives the others are told to
+        stop through a shared Event, checked before each request and download
+        chunk. Tasks the pool has not started yet are run here instead (or
+        dropped once an image is found), so the call never waits on a busy
+        pool, and it returns only when every source has stopped, i.e. before
+        the run's session is closed. Returns (image_data, image_info,
+        google_empty).
+        """
+        cancel = threading.Event()
+        lock = threading.Lock()
+        results = {}
+        winner = []
         
-        # Fetch description if needed (independent of image processing)
-        if needs_description:
-            _logger.info("Fetching description from Google...")
-            description_data = self._fetch_description_from_google(product, search_keywords, config)
+        def run(source):
+            data, info = self._fetch_image_from(source, job, config, session, amazon, cancel)
+            with lock:
+                results[source] = info
+                if data and not winner:
+                    winner.append((source, data, info))
+                    cancel.set()
+        
+        first, *others = job['sources']
+        futures = [(source, executor.submit(run, source)) for source in others]
+        try:
+            run(first)
+        finally:
+            for source, future in futures:
+                if not future.cancel():
+                    future.result()
+                elif not cancel.is_set():
+                    run(source)  # Not started, the pool is busy with other products
+        
+        google_empty = results.get('google', {}).pop('no_results', False)
+        if not winner:
+            return None, {}, google_empty
+        source, image_data, image_info = winner[0]
+        _logger.debug("Race won by %s for product %s", source, job['product'].id)
+        return image_data, image_info, google_empty
+
+    def _log_operation(self, pending, product_id, operation_type, status, message, **kwargs):
+        """Create a log entry, or queue its values when a BatchWrites is given"""
+        Log = self.env['product.image.log']
+        if pending is None:
+            return Log.log_operation(product_id, operation_type, status, message, **kwargs)
+        pending.logs.append(Log._prepare_log_vals(product_id, operation_type, status, message, **kwargs))
+
+    def _write_product(self, pending, product, vals):
+        """Write values on a product, or queue them when a BatchWrites is given"""
+        if pending is None:
+            product.write(vals)
+        else:
+            pending.add_product_vals(product.id, vals)
+
+    def _flush_batch_writes(self, pending, batch_id, job_type):
+        """Write the queued product values, then create the queued attachments
+        and log entries
+        
+        Each product is written in its own savepoint; when a write fails its
+        attachments are dropped and its success entries are replaced by an
+        error entry.
+        """
+        Product = self.env['product.template'].with_context(tracking_disable=True, mail_create_nolog=True)
+        for product_id, vals in pending.product_vals.items():
+            try:
+                with self.env.cr.savepoint():
+                    Product.browse(product_id).write(vals)
+            except Exception as e:
+                _logger.error(f"Failed to write product {product_id}: {str(e)}")
+                pending.attachments = [vals for vals in pending.attachments if vals['res_id'] != product_id]
+                pending.image_urls = [entry for entry in pending.image_urls if entry[0] != product_id]
+                pending.logs = [
+                    log for log in pending.logs
+                    if log['product_id'] != product_id or log['status'] != 'success'
+                ]
+                self._log_operation(
+                    pending, product_id, 'error', 'failed', f"Failed to save {', '.join(vals)}: {str(e)}",
+                    batch_id=batch_id, job_type=job_type
+                )
+        pending.product_vals.clear()
+        
+        if pending.attachments:
+            self._tracking_attachments().create(pending.attachments)
+            pending.attachments = []
+        
+        if pending.logs:
+            self.env['product.image.log'].create(pending.logs)
+            pending.logs = []
+
+    def _flush_batch_caches(self, pending, empty_searches, snapshot):
+        """Save a batch's empty searches, search responses and stored image URLs
+        
+        Runs after _flush_batch_writes, in a savepoint of its own: these rows
+        only spare future requests, so failing to save them costs nothing else.
+        """
+        self.env['product.image.negative.cache']._mark_empty(empty_searches)
+        self.env['product.image.search.cache']._store(snapshot.pop_searches())
+        
+        if pending.image_urls:
+            image_urls = {}
+            for product_id, url_key, info, validators in pending.image_urls:
+                image_urls[url_key] = info
+                if validators:
+                    _URL_VALIDATORS.set(url_key, (*validators, info))
+            for url_key, info in image_urls.items():
+                _STORED_IMAGE_URLS.set(url_key, info)
+            pending.image_urls = []
+            self.env['product.image.url.cache']._remember(image_urls)
+
+    def _apply_product_result(self, product, result, config, batch_id, job_type, pending=None):
+        """Save the fetched image/description and log the outcome (main thread)
+        
+        Product writes and log entries are queued on ``pending`` (a
+        BatchWrites) when given, for the caller to flush in bulk.
+        """
+        start_time = result['start_time']
+        if isinstance(result['image_data'], _StoredImage):
+            image_info = result['image_info']
+            image_data = self._load_stored_image(image_info)
+            if image_data is None:
+                # No stored copy after all; download it now rather than lose the image
+                image_data, image_info = self._download_and_validate_image(
+                    image_info['source_url'], config, image_info.get('source')
+                )
+            result = dict(result, image_data=image_data, image_info=image_info)
+        
+        # Count the attempt in the same write as the image, if any
+        if result['image_attempted']:
+            self._write_product(pending, product, {
+                'image_last_fetch_date': fields.Datetime.now(),
+                'image_fetch_attempts': product.image_fetch_attempts + 1,
+            })
         
         # Save results
-        if image_data:
-            self._save_product_image(product, image_data, image_info, config, batch_id, job_type, start_time)
+        if result['image_data']:
+            self._save_product_image(product, result['image_data'], result['image_info'], config, batch_id, job_type, start_time, pending)
         else:
             # Log no image found as info (not a failure, just no results available)
-            self.env['product.image.log'].log_operation(
-                product.id, 'fetch', 'info', 'No suitable image found from any source',
-                batch_id=batch_id, job_type=job_type, processing_time=time.time() - start_time
+            self._log_operation(
+                pending, product.id, 'fetch', 'info', 'No suitable image found from any source',
+                batch_id=batch_id, job_type=job_type, processing_time=time.perf_counter() - start_time
             )
         
         # Save description if found
+        description_data = result['description_data']
         if description_data and description_data.get('description'):
-            self._save_product_description(product, description_data, batch_id, job_type)
+            self._save_product_description(product, description_data, batch_id, job_type, pending)
         
-        _logger.info(f"Completed processing product {product.id}")
+        # The one INFO line per product
+        _logger.info("prod=%s src=%s image=%s description=%s ms=%d",
+                     product.id, result['image_info'].get('source') or '-', bool(result['image_data']),
+                     bool(description_data and description_data.get('description')),
+                     (time.perf_counter() - start_time) * 1000)
+
+    def _tracking_attachments(self):
+        """ir.attachment for creating tracking attachments
+        
+        They keep the downloaded bytes as is: without image_no_postprocess,
+        images over base.image_autoresize_max_px would be resized and get a
+        checksum that no longer matches the download's, which the URL cache
+        and deduplication look them up by.
+        """
+        return self.env['ir.attachment'].with_context(image_no_postprocess=True)
+
+    def _load_stored_image(self, image_info):
+        """Return the bytes of an image already downloaded from its URL, or None
+        
+        They are read from the tracking attachment with the download's
+        checksum; image_1920 itself may have been resized or re-encoded.
+        """
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', 'product.template'),
+            ('res_field', '=', False),
+            ('checksum', '=', image_info['checksum']),
+        ], limit=1)
+        if not attachment:
+            # Never stored, or gone since; the caller downloads it in full
+            _logger.info("No stored image with checksum %s", image_info['checksum'])
+            url_key = _url_key(image_info['source_url'])
+            _URL_VALIDATORS.discard(url_key)
+            _STORED_IMAGE_URLS.discard(url_key)
+            self.env['product.image.url.cache']._forget(url_key)
+            return None
+        return attachment.raw
 
     def _prepare_search_keywords(self, product):
         """Prepare search keywords for the product"""
-        keywords = []
-        
         # Extract brand from product name if available
         brand = None
         if hasattr(product, 'brand_id') and product.brand_id:
             brand = product.brand_id.name
         
-        # Clean product name - remove internal codes and make more generic
-        if product.name:
-            name = product.name
-            # Remove common internal identifiers
-            name = re.sub(r'\b\d{8}\b', '', name)  # Remove 8-digit codes like 00002649
-            name = re.sub(r'\s+', ' ', name).strip()  # Clean extra spaces
-            
-            # If we have a brand, make sure it's in the search
-            if brand and brand.upper() not in name.upper():
-                keywords.append(f"{brand} {name}")
-            else:
-                keywords.append(name)
-        
-        # Add category for better context
-        if product.categ_id and product.categ_id.name and product.categ_id.name != 'All':
-            category = product.categ_id.name
-            if len(keywords) == 0 or category.lower() not in keywords[0].lower():
-                keywords.append(category)
-        
-        # Join and limit length
-        search_query = ' '.join(keywords[:2])  # Use top 2 elements
-        
-        # Add regional context for better Ecuador/Latin America results
-        if search_query and not any(term in search_query.lower() for term in ['ecuador', 'latina', 'tech', 'producto']):
-            # Don't add "Ecuador" to every search as it might be too restrictive
-            # The country parameters will handle geographic targeting
-            pass
-        
-        # Limit total length to avoid overly complex queries
-        if len(search_query) > 100:
-            search_query = search_query[:100].rsplit(' ', 1)[0]  # Cut at word boundary
-            
-        return search_query
+        category = product.categ_id.name if product.categ_id else None
+        return _build_search_query(product.name or '', brand, category)
 
     def _extract_product_identifiers(self, product):
         """Extract product identifiers like EAN, UPC, etc."""
@@ -285,20 +1500,60 @@ class ProductImageFetcher(models.TransientModel):
             
         return identifiers
 
-    def _fetch_from_amazon(self, product, identifiers, search_keywords, config):
-        """Fetch image from Amazon Product Advertising API"""
+    def _get_amazon_service(self, config):
+        """Build a PA-API client from the configuration (main thread)"""
+        return AmazonPAAPIService(
+            config.amazon_access_key,
+            config.amazon_secret_key,
+            config.amazon_partner_tag,
+            config.amazon_marketplace or 'US',
+        )
+
+    def _fetch_from_amazon(self, product, identifiers, search_keywords, config, session=None, amazon=None,
+                           cancel=None):
+        """Fetch image from Amazon Product Advertising API
+        
+        ``amazon`` is the run's shared AmazonPAAPIService; without one the
+        lookup is skipped, since worker threads cannot read the credentials.
+        """
+        if amazon is None:
+            _logger.debug("No Amazon client for product %s, skipping Amazon", product.id)
+            return None, {}
+        
         try:
-            # This is a placeholder - Amazon API requires complex authentication
-            # For now, we'll skip Amazon integration
-            _logger.info("Amazon integration not yet implemented")
+            # Products reach Amazon only with an EAN-13/UPC-A barcode; it is
+            # searched first, then the keywords are tried
+            item_id = _amazon_item_id(identifiers)
+            if item_id is None:
+                return None, {}
+            
+            for query in (item_id[1], search_keywords):
+                if not query:
+                    continue
+                if _cancelled(cancel):
+                    break
+                result = amazon.search_items_throttled(query)
+                if result and result.get('url'):
+                    image_data, image_info = self._download_and_validate_image(
+                        result['url'], config, 'amazon', session, cancel
+                    )
+                    if image_data:
+                        return image_data, image_info
             
         except Exception as e:
             _logger.warning(f"Amazon fetch failed for product {product.id}: {str(e)}")
         
         return None, {}
 
-    def _fetch_from_google(self, product, search_keywords, config):
-        """Fetch image from Google Custom Search API with API key rotation"""
+    def _fetch_from_google(self, product, search_keywords, config, session=None, cancel=None):
+        """Fetch image from Google Custom Search API with API key rotation
+        
+        When the search returns no usable image (no result, or only images
+        rejected for their content type, size or dimensions) and neither do
+        its fallbacks, the info dict carries ``no_results`` so the query can be
+        cached as empty. Downloads that fail on the network or with an HTTP
+        error leave the outcome unknown.
+        """
         
         try:
             # Get current API key (with rotation support)
@@ -308,50 +1563,34 @@ class ProductImageFetcher(models.TransientModel):
                 _logger.warning(f"Google API not properly configured. Available keys: {available_keys}")
                 return None, {}
 
-            _logger.info(f"Using Google API key #{config.current_api_key_index + 1} (of {len(config.get_available_google_api_keys())})")
+            if _logger.isEnabledFor(logging.DEBUG):
+                _logger.debug("Using Google API key #%s (of %s)",
+                              config.current_api_key_index + 1, len(config.get_available_google_api_keys()))
 
             # Google Custom Search API
-            url = "https://www.googleapis.com/customsearch/v1"
-            params = {
-                'key': current_api_key,
-                'cx': config.google_search_engine_id,
-                'q': search_keywords,
-                'searchType': 'image',
-                'imgSize': 'medium',  # Less restrictive than 'large'
-                'num': 5,  # Get more results to choose from
-                'safe': 'active',
-                'gl': 'ec',  # Ecuador geolocation
-                'hl': 'es'   # Spanish language
-            }
-            
-            session = self._get_session()
-            
-            # Add delay before API call to respect rate limits
-            time.sleep(1)  # 1 second delay between calls
+            url = self._GOOGLE_SEARCH_URL
+            params = self._google_image_params(current_api_key, config, search_keywords)
             
-            response = session.get(url, params=params, timeout=30)
+            session = session or self._get_shared_session()
+            data = self._cached_cse(session, url, params, config, "Google Images API",
+                                    ttl=config.search_cache_days * 86400)
             
-            # Handle rate limiting with API key rotation
-            if self._handle_rate_limit(response, "Google Images API", config):
-                # Update API key if it was rotated
-                current_api_key = config.get_current_google_api_key()
-                params['key'] = current_api_key
-                _logger.info(f"Retrying with API key #{config.current_api_key_index + 1}")
-                # Retry after rate limit wait or key rotation
-                response = session.get(url, params=params, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
+            if data is not None:
                 items = data.get('items', [])
                 
-                _logger.info(f"Google returned {len(items)} image results")
+                _logger.debug("Google returned %s image results", len(items))
                 
                 if items:
                     # Try each image until we find a valid one
+                    all_rejected = True
                     for item in items:
+                        if _cancelled(cancel):
+                            return None, {}
                         image_url = item.get('link')
                         if image_url:
-                            image_data, image_info = self._download_and_validate_image(image_url, config, 'google')
+                            image_data, image_info = self._download_and_validate_image(
+                                image_url, config, 'google', session, cancel
+                            )
                             if image_data:
                                 image_info.update({
                                     'title': item.get('title', ''),
@@ -359,69 +1598,68 @@ class ProductImageFetcher(models.TransientModel):
                                     'api_key_used': config.current_api_key_index + 1
                                 })
                                 return image_data, image_info
+                            all_rejected = all_rejected and image_info.get('rejected', False)
+                    
+                    # When every result was rejected for its content, the same
+                    # search would give the same ones
+                    return None, ({'no_results': True} if all_rejected else {})
                 else:
-                    # No results found, log as info and try fallback searches
-                    _logger.info("No results with original search, trying fallback strategies...")
-                    # Log the info about no original results
-                    self.env['product.image.log'].log_operation(
-                        product.id, 'fetch', 'info', 'No results with original search, trying fallback strategies'
-                    )
-                    return self._try_fallback_searches(product, config, session, url, current_api_key)
-                
-            else:
-                _logger.warning(f"Google API returned status {response.status_code}: {response.text}")
+                    # No results found, try fallback searches
+                    _logger.debug("No results with original search for product %s, trying fallback strategies...", product.id)
+                    return self._try_fallback_searches(product, config, session, url, params['key'], cancel)
                 
-        except requests.exceptions.RequestException as e:
+        except TRANSPORT_ERRORS as e:
             _logger.error(f"Network error in Google fetch: {str(e)}")
         except Exception as e:
             _logger.error(f"Error in Google fetch: {str(e)}")
             
         return None, {}
 
-    def _try_fallback_searches(self, product, config, session, url, api_key):
-        """Try simplified search strategies when main search fails"""
+    def _try_fallback_searches(self, product, config, session, url, api_key, cancel=None):
+        """Try simplified search strategies when main search fails
+        
+        Returns ``no_results`` in the info dict when every fallback search
+        answered without a result whose image was not rejected for its content.
+        """
         
         fallback_queries = []
+        found_results = False
         
         # Strategy 1: Just the product name without codes/categories
         if product.name:
-            clean_name = re.sub(r'\b\d{5,}\b', '', product.name)  # Remove long number codes
-            clean_name = re.sub(r'\s+', ' ', clean_name).strip()
+            clean_name = _RE_LONGCODE.sub('', product.name)  # Remove long number codes
+            clean_name = _RE_WS.sub(' ', clean_name).strip()
             if clean_name:
                 fallback_queries.append(clean_name)
         
         # Try each fallback query
         for i, query in enumerate(fallback_queries[:3]):  # Limit to 3 attempts
-            _logger.info(f"Trying fallback search #{i+1}: '{query}'")
-            
-            params = {
-                'key': api_key,
-                'cx': config.google_search_engine_id,
-                'q': query,
-                'searchType': 'image',
-                'imgSize': 'medium',
-                'num': 3,
-                'safe': 'active',
-                'gl': 'ec',
-                'hl': 'es'
-            }
+            if _cancelled(cancel):
+                return None, {}
+            _logger.debug("Trying fallback search #%s: '%s'", i + 1, query)
             
-            time.sleep(0.5)
+            params = self._google_image_params(api_key, config, query, num=3)
             
             try:
-                response = session.get(url, params=params, timeout=15)
-                if response.status_code == 200:
-                    data = response.json()
+                data = self._cached_cse(session, url, params, config, "Google Fallback Search", timeout=15,
+                                        ttl=config.search_cache_days * 86400)
+                if data is None:
+                    found_results = True  # Unknown outcome, not an empty search
+                else:
                     items = data.get('items', [])
                     
-                    _logger.info(f"Fallback search #{i+1} returned {len(items)} results")
+                    _logger.debug("Fallback search #%s returned %s results", i + 1, len(items))
                     
                     if items:
                         # Try each image
                         for item in items:
+                            if _cancelled(cancel):
+                                return None, {}
                             image_url = item.get('link')
                             if image_url:
-                                image_data, image_info = self._download_and_validate_image(image_url, config, 'google')
+                                image_data, image_info = self._download_and_validate_image(
+                                    image_url, config, 'google', session, cancel
+                                )
                                 if image_data:
                                     image_info.update({
                                         'title': item.get('title', ''),
@@ -429,17 +1667,24 @@ class ProductImageFetcher(models.TransientModel):
                                         'search_query': query,
                                         'api_key_used': config.current_api_key_index + 1
                                     })
-                                    _logger.info(f"Found image using fallback search: '{query}'")
+                                    _logger.debug("Found image using fallback search: '%s'", query)
                                     return image_data, image_info
+                                if not image_info.get('rejected'):
+                                    found_results = True  # Download failed, outcome unknown
                                     
             except Exception as e:
                 _logger.warning(f"Fallback search #{i+1} failed: {str(e)}")
+                found_results = True
                 continue
         
-        return None, {}
+        return None, ({} if found_results else {'no_results': True})
 
-    def _fetch_description_from_google(self, product, search_keywords, config):
-        """Fetch product description from Google Custom Search API"""
+    def _fetch_description_from_google(self, product, search_keywords, config, session=None):
+        """Fetch product description from Google Custom Search API
+        
+        Returns ``{'no_results': True}`` when the search answered without a
+        usable snippet, so the query can be cached as empty.
+        """
         
         try:
             # Get current API key
@@ -448,35 +1693,17 @@ class ProductImageFetcher(models.TransientModel):
                 _logger.warning("Google API not configured for description fetching")
                 return {}
 
-            _logger.info(f"Fetching description using Google API key #{config.current_api_key_index + 1}")
+            _logger.debug("Fetching description using Google API key #%s", config.current_api_key_index + 1)
 
             # Google Custom Search API for web results
-            url = "https://www.googleapis.com/customsearch/v1"
-            params = {
-                'key': current_api_key,
-                'cx': config.google_search_engine_id,
-                'q': f"{search_keywords} product description specifications",
-                'num': 5,  # Get multiple results for better description
-                'safe': 'active',
-                'gl': 'ec',  # Ecuador geolocation
-                'hl': 'es'   # Spanish language
-            }
-            
-            session = self._get_session()
-            time.sleep(1)  # Rate limiting
+            url = self._GOOGLE_SEARCH_URL
+            params = self._google_description_params(current_api_key, config, search_keywords)
             
-            response = session.get(url, params=params, timeout=30)
+            session = session or self._get_shared_session()
+            data = self._cached_cse(session, url, params, config, "Google Description API",
+                                    ttl=config.description_cache_hours * 3600)
             
-            # Handle rate limiting with API key rotation
-            if self._handle_rate_limit(response, "Google Description API", config):
-                # Update API key if it was rotated
-                current_api_key = config.get_current_google_api_key()
-                params['key'] = current_api_key
-                _logger.info(f"Retrying description fetch with API key #{config.current_api_key_index + 1}")
-                response = session.get(url, params=params, timeout=30)
-            
-            if response.status_code == 200:
-                data = response.json()
+            if data is not None:
                 items = data.get('items', [])
                 
                 if items:
@@ -495,8 +1722,7 @@ class ProductImageFetcher(models.TransientModel):
                             'source': 'google_search',
                             'api_key_used': config.current_api_key_index + 1
                         }
-            else:
-                _logger.warning(f"Google Description API returned status {response.status_code}")
+                return {'no_results': True}
                 
         except Exception as e:
             _logger.error(f"Error fetching description from Google: {str(e)}")
@@ -508,25 +1734,23 @@ class ProductImageFetcher(models.TransientModel):
         if not descriptions:
             return ""
         
-        # Remove duplicates and clean up
+        # Remove duplicates and near-duplicates (same text from several retailers)
         unique_descriptions = []
-        seen = set()
+        kept_hashes = []
         
         for desc in descriptions:
-            # Clean up the description
-            desc = desc.strip()
-            desc = desc.replace('\n', ' ').replace('\r', '')
+            # Clean up the description and remove common prefixes, one pass each
+            desc = desc.strip().translate(_NEWLINES_TABLE)
+            desc = _RE_SHOP_PREFIXES.sub('', desc, count=1)
             
-            # Remove common prefixes/suffixes
-            for prefix in ['Buy ', 'Shop ', 'Get ', 'Find ']:
-                if desc.startswith(prefix):
-                    desc = desc[len(prefix):]
-            
-            # Skip if too short or already seen
-            if len(desc) < 30 or desc.lower() in seen:
+            # Skip if too short or too close to a kept snippet
+            if len(desc) < 30:
+                continue
+            desc_hash = _simhash(desc)
+            if any(bin(desc_hash ^ kept).count('1') < SIMHASH_MAX_DISTANCE for kept in kept_hashes):
                 continue
                 
-            seen.add(desc.lower())
+            kept_hashes.append(desc_hash)
             unique_descriptions.append(desc)
         
         if not unique_descriptions:
@@ -547,32 +1771,38 @@ class ProductImageFetcher(models.TransientModel):
             
         return main_desc[:500]  # Limit length
 
-    def _fetch_from_bing(self, product, search_keywords, config):
+    def _fetch_from_bing(self, product, search_keywords, config, session=None, cancel=None):
         """Fetch image from Bing Image Search API"""
         try:
             if not config.bing_api_key:
                 return None, {}
             
-            url = "https://api.cognitive.microsoft.com/bing/v7.0/images/search"
-            headers = {'Ocp-Apim-Subscription-Key': config.bing_api_key}
-            params = {
-                'q': search_keywords,
-                'imageType': 'Photo',
-                'size': 'Large',
-                'count': 3
-            }
+            params = self._bing_image_params(search_keywords)
             
-            session = self._get_session()
-            response = session.get(url, headers=headers, params=params, timeout=30)
+            cache_key = _search_cache_key('bing', params)
+            data = _SEARCH_CACHE.get(cache_key)
+            if data is None:
+                session = session or self._get_shared_session()
+                response = self._bing_get(self._get_search_client() or session, params, config)
+                if response.status_code == 200:
+                    data = response.json()
+                    self._cache_search(cache_key, data, config, config.search_cache_days * 86400)
+                else:
+                    _logger.warning(f"Bing Image Search returned status {response.status_code}: {response.text}")
+            else:
+                _logger.debug("Bing Image Search: served '%s' from cache", search_keywords)
             
-            if response.status_code == 200:
-                data = response.json()
+            if data is not None:
                 images = data.get('value', [])
                 
                 for image in images:
+                    if _cancelled(cancel):
+                        break
                     image_url = image.get('contentUrl')
                     if image_url:
-                        image_data, image_info = self._download_and_validate_image(image_url, config, 'bing')
+                        image_data, image_info = self._download_and_validate_image(
+                            image_url, config, 'bing', session, cancel
+                        )
                         if image_data:
                             image_info.update({
                                 'title': image.get('name', ''),
@@ -585,27 +1815,162 @@ class ProductImageFetcher(models.TransientModel):
             
         return None, {}
 
-    def _download_and_validate_image(self, image_url, config, source):
-        """Download and validate an image"""
+    def _probe(self, url, session, max_bytes):
+        """Check cheaply whether a URL is worth downloading
+        
+        Sends a HEAD request and rejects the URL when it is not an image or is
+        larger than ``max_bytes``. Servers that refuse HEAD get a ranged GET for
+        the first bytes instead. Known image CDNs are not probed. Returns False
+        only when the URL's content is known to be unusable; HTTP errors are
+        left for the download to report.
+        """
+        host = (urllib.parse.urlsplit(url).hostname or '').lower()
+        if host.endswith(PROBE_SKIP_HOSTS):
+            return True
+        
         try:
-            session = self._get_session()
-            
-            # Download with timeout
-            response = session.get(image_url, timeout=30, stream=True)
-            response.raise_for_status()
+            response = session.head(url, allow_redirects=True, timeout=PROBE_TIMEOUT)
+            if response.status_code in (405, 501):
+                response = session.get(
+                    url, headers={'Range': f'bytes=0-{PROBE_RANGE_BYTES - 1}'},
+                    timeout=PROBE_TIMEOUT, stream=True,
+                )
+                response.close()
+        except requests.exceptions.RequestException as e:
+            _logger.debug(f"Probe failed for {url}: {str(e)}")
+            return True  # Let the download decide
+        
+        if response.status_code >= 400:
+            _logger.debug(f"Probe returned status {response.status_code}: {url}")
+            return True  # Let the download decide
+        
+        content_type = response.headers.get('content-type', '').lower()
+        if content_type and 'image' not in content_type:
+            _logger.warning(f"Invalid content type: {content_type}")
+            return False
+        
+        # A ranged reply reports the full size after the slash
+        content_range = response.headers.get('content-range', '')
+        if response.status_code == 206 and '/' in content_range:
+            total = content_range.rsplit('/', 1)[1]
+            size = int(total) if total.isdigit() else 0
+        else:
+            size = int(response.headers.get('content-length') or 0)
+        if size > max_bytes:
+            _logger.warning(f"Image too large ({size} bytes): {url}")
+            return False
+        
+        return True
+
+    def _download_and_validate_image(self, image_url, config, source, session=None, cancel=None):
+        """Download and validate an image, reusing recent outcomes for its URL
+        
+        Variants and re-runs often get the same search results, so a URL whose
+        image is already stored is not downloaded again, and one rejected for
+        its content under the same limits is skipped without any request.
+        Such rejections return ``{'rejected': True}`` as image info; failed
+        requests return an empty dict and are retried next time.
+        """
+        url_key = _url_key(image_url)
+        rejected_key = (url_key, *_image_limits(config))
+        if _REJECTED_URLS.get(rejected_key):
+            _logger.debug("Skipping recently rejected image: %s", image_url)
+            return None, {'rejected': True}
+        stored = _STORED_IMAGE_URLS.get(url_key)
+        if stored is not None:
+            _logger.debug("Image from this URL is already stored: %s", image_url)
+            return _StoredImage(stored['checksum']), dict(stored, source=source)
+        
+        image_data, image_info = self._fetch_and_validate_image(image_url, config, source, session, cancel)
+        if image_info.get('rejected'):
+            _REJECTED_URLS.set(rejected_key, True)
+        return image_data, image_info
+
+    def _fetch_and_validate_image(self, image_url, config, source, session=None, cancel=None):
+        """Download and validate an image
+        
+        Returns a memoryview of the downloaded bytes; they are base64-encoded
+        once when saved. Images rejected for their content type, size or
+        dimensions get ``{'rejected': True}`` as image info. A download whose
+        race was lost (``cancel`` set) is abandoned with an empty info.
+        """
+        try:
+            session = session or self._get_shared_session()
+            max_bytes, min_width, min_height = _image_limits(config)
             
-            # Check content type
-            content_type = response.headers.get('content-type', '').lower()
-            if 'image' not in content_type:
-                _logger.warning(f"Invalid content type: {content_type}")
-                return None, {}
+            # A URL accepted before is revalidated instead of probed
+            url_key = _url_key(image_url)
+            validators = _URL_VALIDATORS.get(url_key)
+            headers = {}
+            if validators is not None:
+                etag, last_modified, known_info = validators
+                if etag:
+                    headers['If-None-Match'] = etag
+                if last_modified:
+                    headers['If-Modified-Since'] = last_modified
+            elif not self._probe(image_url, session, max_bytes):
+                return None, {'rejected': True}
             
-            # Read image data
-            image_data = response.content
+            # Download with timeout; the slot is held until the body is read
+            with _IMAGE_DOWNLOAD_SLOTS:
+                response = session.get(image_url, headers=headers, timeout=IMAGE_TIMEOUT, stream=True)
+                try:
+                    if response.status_code == 304 and validators is not None:
+                        _logger.debug("Image not modified, reusing the stored copy: %s", image_url)
+                        return _StoredImage(known_info['checksum']), dict(known_info, source=source)
+                    response.raise_for_status()
+                    
+                    # Check content type
+                    content_type = response.headers.get('content-type', '').lower()
+                    if 'image' not in content_type:
+                        _logger.warning(f"Invalid content type: {content_type}")
+                        return None, {'rejected': True}
+                    
+                    # Skip oversized images before reading the body
+                    content_length = int(response.headers.get('content-length') or 0)
+                    if content_length > max_bytes:
+                        _logger.warning(f"Image too large ({content_length} bytes): {image_url}")
+                        return None, {'rejected': True}
+                    
+                    # Read image data, aborting as soon as the cap is exceeded
+                    buffer = io.BytesIO()
+                    digest = hashlib.sha1()  # Hashed while the chunks are hot in cache
+                    header = None
+                    for chunk in response.iter_content(IMAGE_CHUNK_SIZE):
+                        if _cancelled(cancel):
+                            _logger.debug("Race lost, abandoning download: %s", image_url)
+                            return None, {}
+                        buffer.write(chunk)
+                        digest.update(chunk)
+                        if buffer.tell() > max_bytes:
+                            _logger.warning(f"Image exceeded {max_bytes} bytes while downloading: {image_url}")
+                            return None, {'rejected': True}
+                        # Abort small images as soon as their PNG/JPEG header has arrived
+                        if header is None and buffer.tell() - len(chunk) < PROBE_RANGE_BYTES:
+                            header = _probe_image_header(buffer.getvalue())
+                            if header is not None and (header.width < min_width or header.height < min_height):
+                                _logger.warning(f"Image too small ({header.width}x{header.height}, "
+                                                f"minimum {min_width}x{min_height}): {image_url}")
+                                return None, {'rejected': True}
+                    # A view on the downloaded bytes, so they are never copied again
+                    image_data = buffer.getbuffer()
+                finally:
+                    response.close()
             
-            # Basic validation with PIL
+            # Basic validation from the PNG/JPEG header, with PIL for other formats
             try:
-                image = Image.open(io.BytesIO(image_data))
+                image = header or _probe_image_header(image_data)
+                if image is None:
+                    # Only the header is needed; close PIL's file right away
+                    buffer.seek(0)
+                    with Image.open(buffer) as pil_image:
+                        image = _ImageHeader(pil_image.format, pil_image.width, pil_image.height)
+                
+                # Reject small images from the header alone, before any scoring
+                if image.width < min_width or image.height < min_height:
+                    _logger.warning(f"Image too small ({image.width}x{image.height}, "
+                                    f"minimum {min_width}x{min_height}): {image_url}")
+                    return None, {'rejected': True}
                 
                 # Calculate quality score
                 quality_score = self._calculate_image_quality(image)
@@ -615,18 +1980,26 @@ class ProductImageFetcher(models.TransientModel):
                     'height': image.height,
                     'format': image.format or 'JPEG',
                     'size_bytes': len(image_data),
+                    'checksum': digest.hexdigest(),
                     'quality_score': quality_score,
                     'source_url': image_url,
                     'source': source
                 }
                 
-                _logger.info(f"Image found: {image.width}x{image.height}, {len(image_data)} bytes, quality: {quality_score}")
+                _logger.debug("Image found: %sx%s, %s bytes, quality: %s",
+                              image.width, image.height, len(image_data), quality_score)
+                
+                # Recorded for conditional GETs once the image is stored
+                etag = response.headers.get('etag')
+                last_modified = response.headers.get('last-modified')
+                if etag or last_modified:
+                    image_info['validators'] = (etag, last_modified)
                 
-                return base64.b64encode(image_data).decode('utf-8'), image_info
+                return image_data, image_info
                 
             except Exception as e:
                 _logger.warning(f"PIL validation failed: {str(e)}")
-                return None, {}
+                return None, {'rejected': True}  # Not a readable image
                 
         except Exception as e:
             _logger.warning(f"Download failed for {image_url}: {str(e)}")
@@ -634,21 +2007,17 @@ class ProductImageFetcher(models.TransientModel):
         return None, {}
 
     def _calculate_image_quality(self, image):
-        """Calculate a simple quality score for the image"""
+        """Calculate a simple quality score for the image
+        
+        Only the size and format from the header are used, so the pixel data
+        is never decoded.
+        """
         try:
             # Basic quality metrics
             width, height = image.size
             
             # Resolution score (0-40 points)
-            total_pixels = width * height
-            if total_pixels >= 1000000:  # 1MP+
-                resolution_score = 40
-            elif total_pixels >= 500000:  # 0.5MP+
-                resolution_score = 30
-            elif total_pixels >= 200000:  # 0.2MP+
-                resolution_score = 20
-            else:
-                resolution_score = 10
+            resolution_score = _RESOLUTION_SCORES[bisect.bisect_right(_RESOLUTION_THRESHOLDS, width * height)]
             
             # Aspect ratio score (0-20 points) - prefer standard ratios
             aspect_ratio = width / height
@@ -660,22 +2029,31 @@ class ProductImageFetcher(models.TransientModel):
                 aspect_score = 5
             
             # Format score (0-10 points)
-            if image.format in ['JPEG', 'PNG']:
-                format_score = 10
-            else:
-                format_score = 5
+            format_score = _FORMAT_SCORES.get(image.format, 5)
             
-            return min(resolution_score + aspect_score + format_score, 100)
+            return resolution_score + aspect_score + format_score  # At most 70
             
         except Exception:
             return 50  # Default score
 
-    def _save_product_image(self, product, image_data, image_info, config, batch_id, job_type, start_time):
-        """Save the image to the product"""
+    def _save_product_image(self, product, image_data, image_info, config, batch_id, job_type, start_time, pending=None):
+        """Save the image to the product
+        
+        With deduplication on, an image identical to one already stored for a
+        product is still set on this product, but gets no extra tracking
+        attachment.
+        """
         try:
-            # Update product image
-            product.write({
-                'image_1920': image_data
+            # Same digest as ir.attachment.checksum, normally taken during the download
+            checksum = image_info.get('checksum') or hashlib.sha1(image_data).hexdigest()
+            duplicate = self._is_duplicate_image(checksum, config, pending)
+            
+            # Update product image and its tracking fields in one write
+            source = (image_info.get('source') or '').split('_', 1)[0]  # google_fallback -> google
+            self._write_product(pending, product, {
+                'image_1920': base64.b64encode(image_data),  # Image fields take base64
+                'image_fetch_source': source if source in ('amazon', 'google', 'bing') else False,
+                'image_quality_score': image_info.get('quality_score', 0),
             })
             
             # Create attachment record for tracking
@@ -684,27 +2062,43 @@ class ProductImageFetcher(models.TransientModel):
                 'res_model': 'product.template',
                 'res_id': product.id,
                 'type': 'binary',
-                'datas': image_data,
-                'mimetype': f"image/{image_info.get('image_format', 'jpeg')}",
+                'raw': image_data,  # The download buffer, stored without a copy or base64 round trip
+                'mimetype': f"image/{(image_info.get('format') or 'jpeg').lower()}",
             }
             
-            self.env['ir.attachment'].create(attachment_vals)
+            if duplicate:
+                self._log_operation(
+                    pending, product.id, 'dedup', 'info', 'Image already stored for another product, no tracking attachment created',
+                    batch_id=batch_id, job_type=job_type
+                )
+            elif pending is None:
+                self._tracking_attachments().create(attachment_vals)
+            else:
+                pending.attachments.append(attachment_vals)
+                # The tracking attachment keeps the downloaded bytes, so its
+                # checksum is the download's and the URL need not be fetched again
+                if image_info.get('source_url'):
+                    info = {key: image_info[key] for key in STORED_IMAGE_INFO_KEYS if key in image_info}
+                    info['checksum'] = checksum
+                    pending.image_urls.append((
+                        product.id, _url_key(image_info['source_url']), info, image_info.get('validators')
+                    ))
             
             # Log success
-            self.env['product.image.log'].log_operation(
-                product.id, 'fetch', 'success', 'Image successfully downloaded and saved',
-                batch_id=batch_id, job_type=job_type, processing_time=time.time() - start_time,
+            self._log_operation(
+                pending, product.id, 'fetch', 'success', 'Image successfully downloaded and saved',
+                batch_id=batch_id, job_type=job_type, processing_time=time.perf_counter() - start_time,
                 **image_info
             )
             
         except Exception as e:
             _logger.error(f"Failed to save image for product {product.id}: {str(e)}")
-            self.env['product.image.log'].log_operation(
-                product.id, 'error', 'failed', f"Failed to save image: {str(e)}",
-                batch_id=batch_id, job_type=job_type, processing_time=time.time() - start_time
+            self._log_operation(
+                pending, product.id, 'error', 'failed', f"Failed to save image: {str(e)}",
+                batch_id=batch_id, job_type=job_type, processing_time=time.perf_counter() - start_time
             )
 
-    def _save_product_description(self, product, description_data, batch_id, job_type):
+    def _save_product_description(self, product, description_data, batch_id, job_type, pending=None):
         """Save the generated description to the product"""
         try:
             description = description_data.get('description', '')
@@ -727,26 +2121,34 @@ class ProductImageFetcher(models.TransientModel):
                 update_vals['website_description'] = description
             
             if update_vals:
-                product.write(update_vals)
-                _logger.info(f"Updated descriptions for product {product.id}: {list(update_vals.keys())}")
+                self._write_product(pending, product, update_vals)
+                _logger.debug("Updated descriptions for product %s: %s", product.id, list(update_vals))
                 
                 # Log success
-                self.env['product.image.log'].log_operation(
-                    product.id, 'update', 'success', 
+                self._log_operation(
+                    pending, product.id, 'update', 'success', 
                     f"Description generated and saved to {', '.join(update_vals.keys())}",
                     batch_id=batch_id, job_type=job_type,
                     source=description_data.get('source', 'unknown')
                 )
             else:
-                _logger.info(f"Product {product.id} already has descriptions, skipping update")
+                _logger.debug("Product %s already has descriptions, skipping update", product.id)
                 
         except Exception as e:
             _logger.error(f"Failed to save description for product {product.id}: {str(e)}")
-            self.env['product.image.log'].log_operation(
-                product.id, 'error', 'failed', f"Failed to save description: {str(e)}",
+            self._log_operation(
+                pending, product.id, 'error', 'failed', f"Failed to save description: {str(e)}",
                 batch_id=batch_id, job_type=job_type
             )
 
+    def _get_enabled_sources(self, config):
+        """Return which image sources are enabled and fully configured"""
+        return {
+            'amazon': bool(config.use_amazon_api and self._has_amazon_config(config)),
+            'google': bool(config.use_google_images and self._has_google_config(config)),
+            'bing': bool(config.use_bing_images and self._has_bing_config(config)),
+        }
+
     def _has_amazon_config(self, config):
         """Check if Amazon API configuration is complete"""
         return all([config.amazon_access_key, config.amazon_secret_key, config.amazon_partner_tag])
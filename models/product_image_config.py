@@ -31,13 +31,22 @@ class ProductImageConfig(models.Model):
     google_search_engine_id = fields.Char('Google Search Engine ID')
     current_api_key_index = fields.Integer('Current API Key Index', default=0)
     api_keys_count = fields.Integer('Number of Available Keys', compute='_compute_api_keys_count', store=False)
+    search_cache_version = fields.Integer('Search Cache Version', default=0,
+                                          help='Part of the key of cached empty searches; bump it to search them again')
+    search_cache_days = fields.Integer('Image Search Cache (Days)', default=7,
+                                       help='How long image search results are reused; 0 disables the cache')
+    description_cache_hours = fields.Integer('Description Search Cache (Hours)', default=24,
+                                             help='How long description search results are reused; 0 disables the cache')
     
     use_bing_images = fields.Boolean('Use Bing Images Fallback', default=False)
     bing_api_key = fields.Char('Bing API Key')
     
     # Image Quality Settings
-    min_image_width = fields.Integer('Minimum Image Width (px)', default=800)
-    min_image_height = fields.Integer('Minimum Image Height (px)', default=600)
+    # Google is searched with imgSize=medium, so higher minimums reject most results
+    min_image_width = fields.Integer('Minimum Image Width (px)', default=200,
+                                     help='Narrower images are rejected from their header; 0 disables the check')
+    min_image_height = fields.Integer('Minimum Image Height (px)', default=200,
+                                      help='Shorter images are rejected from their header; 0 disables the check')
     min_image_size = fields.Integer('Minimum Image Size (KB)', default=50)
     max_image_size = fields.Float('Maximum Image Size (MB)', default=5.0)
     max_image_size_mb = fields.Float('Maximum Image Size (MB)', default=5.0)  # Alias for compatibility
@@ -51,6 +60,8 @@ class ProductImageConfig(models.Model):
     # Rate Limiting
     requests_per_minute = fields.Integer('Requests Per Minute', default=60)
     daily_requests_limit = fields.Integer('Daily Requests Limit', default=1000)
+    max_concurrency = fields.Integer('Max Concurrent Products', default=10,
+                                     help='Number of products fetched at the same time within a batch')
     
     # Processing Settings
     batch_size = fields.Integer('Batch Size for Processing', default=50)
@@ -246,4 +257,18 @@ class ProductImageConfig(models.Model):
                 'type': 'success',
                 'sticky': False,
             }
-        }
\ No newline at end of file
+        }
+    
+    def action_clear_search_cache(self):
+        """Search again for products whose last searches found nothing"""
+        self.ensure_one()
+        self.search_cache_version += 1
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'message': 'Cached empty searches will be retried on the next run',
+                'type': 'success',
+                'sticky': False,
+            }
+        }
@@ -61,6 +61,14 @@ class ProductImageLog(models.Model):
     @api.model
     def log_operation(self, product_id, operation_type, status, message, **kwargs):
         """Helper method to create log entries"""
+        return self.create(self._prepare_log_vals(product_id, operation_type, status, message, **kwargs))
+    
+    @api.model
+    def _prepare_log_vals(self, product_id, operation_type, status, message, **kwargs):
+        """Build the values of a log entry without creating it
+        
+        Lets batch jobs buffer entries and create them with a single create().
+        """
         product = self.env['product.template'].browse(product_id) if product_id else None
         
         vals = {
@@ -79,7 +87,7 @@ class ProductImageLog(models.Model):
             if field in kwargs:
                 vals[field] = kwargs[field]
         
-        return self.create(vals)
+        return vals
     
     @api.model
     def cleanup_old_logs(self, retention_days=30):
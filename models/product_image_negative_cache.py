@@ -0,0 +1,60 @@
+from odoo import api, fields, models
+from datetime import timedelta
+import hashlib
+import logging
+
+_logger = logging.getLogger(__name__)
+
+NEGATIVE_CACHE_DAYS = 7
+
+
+class ProductImageNegativeCache(models.Model):
+    _name = 'product.image.negative.cache'
+    _description = 'Product Image Search Negative Cache'
+    _rec_name = 'query_hash'
+
+    query_hash = fields.Char('Query Hash', required=True, index=True)
+    checked_at = fields.Datetime('Last Checked', required=True, default=fields.Datetime.now)
+
+    _sql_constraints = [
+        ('query_hash_uniq', 'unique(query_hash)', 'Each search query is cached only once.'),
+    ]
+
+    @api.model
+    def _query_hash(self, query, engine_id, version=0):
+        """Hash a search query with the settings that affect its results"""
+        return hashlib.sha1(f"{version}\x00{engine_id}\x00{query}".encode('utf-8')).hexdigest()
+
+    @api.model
+    def _get_known_empty(self, query_hashes):
+        """Return the hashes among query_hashes that found nothing recently"""
+        if not query_hashes:
+            return set()
+        cutoff = fields.Datetime.now() - timedelta(days=NEGATIVE_CACHE_DAYS)
+        records = self.search_read([
+            ('query_hash', 'in', list(query_hashes)),
+            ('checked_at', '>', cutoff),
+        ], ['query_hash'])
+        return {record['query_hash'] for record in records}
+
+    @api.model
+    def _mark_empty(self, query_hashes):
+        """Remember that these queries found nothing as of now"""
+        query_hashes = set(query_hashes)
+        if not query_hashes:
+            return
+        now = fields.Datetime.now()
+        existing = self.search([('query_hash', 'in', list(query_hashes))])
+        existing.write({'checked_at': now})
+        new_hashes = query_hashes - set(existing.mapped('query_hash'))
+        self.create([{'query_hash': query_hash, 'checked_at': now} for query_hash in new_hashes])
+
+    @api.model
+    def cleanup_expired(self):
+        """Drop entries older than the cache lifetime"""
+        cutoff = fields.Datetime.now() - timedelta(days=NEGATIVE_CACHE_DAYS)
+        expired = self.search([('checked_at', '<=', cutoff)])
+        count = len(expired)
+        expired.unlink()
+        _logger.info(f"Cleaned up {count} expired negative cache entries")
+        return count
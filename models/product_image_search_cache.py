@@ -0,0 +1,61 @@
+from odoo import api, fields, models
+from datetime import timedelta
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductImageSearchCache(models.Model):
+    _name = 'product.image.search.cache'
+    _description = 'Product Image Search Result Cache'
+    _rec_name = 'cache_key'
+
+    cache_key = fields.Char('Cache Key', required=True, index=True)
+    payload = fields.Text('Response', required=True)
+    expires_at = fields.Datetime('Expires At', required=True, index=True)
+
+    _sql_constraints = [
+        ('cache_key_uniq', 'unique(cache_key)', 'Each search is cached only once.'),
+    ]
+
+    @api.model
+    def _get_valid(self, cache_keys=None, limit=None):
+        """Return {cache_key: (payload, seconds_left)} of the unexpired entries,
+        the longest-lived first, only for ``cache_keys`` when given"""
+        now = fields.Datetime.now()
+        domain = [('expires_at', '>', now)]
+        if cache_keys is not None:
+            domain.append(('cache_key', 'in', list(cache_keys)))
+        records = self.search_read(
+            domain, ['cache_key', 'payload', 'expires_at'],
+            order='expires_at desc', limit=limit
+        )
+        return {
+            record['cache_key']: (json.loads(record['payload']), (record['expires_at'] - now).total_seconds())
+            for record in records
+        }
+
+    @api.model
+    def _store(self, entries):
+        """Save search responses given as {cache_key: (payload, ttl_seconds)}"""
+        if not entries:
+            return
+        now = fields.Datetime.now()
+        values = {
+            key: {'payload': json.dumps(payload), 'expires_at': now + timedelta(seconds=ttl)}
+            for key, (payload, ttl) in entries.items()
+        }
+        existing = self.search([('cache_key', 'in', list(values))])
+        for record in existing:
+            record.write(values.pop(record.cache_key))
+        self.create([dict(vals, cache_key=key) for key, vals in values.items()])
+
+    @api.model
+    def cleanup_expired(self):
+        """Drop expired entries"""
+        expired = self.search([('expires_at', '<=', fields.Datetime.now())])
+        count = len(expired)
+        expired.unlink()
+        _logger.info(f"Cleaned up {count} expired search cache entries")
+        return count
@@ -0,0 +1,67 @@
+from odoo import api, fields, models
+from datetime import timedelta
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+URL_CACHE_DAYS = 30
+
+
+class ProductImageUrlCache(models.Model):
+    _name = 'product.image.url.cache'
+    _description = 'Product Image Source URL Cache'
+    _rec_name = 'url_hash'
+
+    url_hash = fields.Char('URL Hash', required=True, index=True)
+    checksum = fields.Char('Image Checksum', required=True, index=True)
+    image_info = fields.Text('Image Info', required=True)
+    last_used = fields.Datetime('Last Used', required=True, default=fields.Datetime.now)
+
+    _sql_constraints = [
+        ('url_hash_uniq', 'unique(url_hash)', 'Each image URL is cached only once.'),
+    ]
+
+    @api.model
+    def _get_recent(self, url_hashes=None, limit=None):
+        """Return {url_hash: image_info} of the URLs used within the cache
+        lifetime, the most recently used first, only for ``url_hashes`` when given"""
+        cutoff = fields.Datetime.now() - timedelta(days=URL_CACHE_DAYS)
+        domain = [('last_used', '>', cutoff)]
+        if url_hashes is not None:
+            domain.append(('url_hash', 'in', list(url_hashes)))
+        records = self.search_read(
+            domain, ['url_hash', 'image_info'],
+            order='last_used desc', limit=limit
+        )
+        return {record['url_hash']: json.loads(record['image_info']) for record in records}
+
+    @api.model
+    def _remember(self, entries):
+        """Record image URLs whose image is stored, given as {url_hash: image_info}"""
+        if not entries:
+            return
+        now = fields.Datetime.now()
+        values = {
+            url_hash: {'checksum': info['checksum'], 'image_info': json.dumps(info), 'last_used': now}
+            for url_hash, info in entries.items()
+        }
+        existing = self.search([('url_hash', 'in', list(values))])
+        for record in existing:
+            record.write(values.pop(record.url_hash))
+        self.create([dict(vals, url_hash=url_hash) for url_hash, vals in values.items()])
+
+    @api.model
+    def _forget(self, url_hash):
+        """Drop a URL whose image is no longer stored"""
+        self.search([('url_hash', '=', url_hash)]).unlink()
+
+    @api.model
+    def cleanup_expired(self):
+        """Drop URLs not used within the cache lifetime"""
+        cutoff = fields.Datetime.now() - timedelta(days=URL_CACHE_DAYS)
+        expired = self.search([('last_used', '<=', cutoff)])
+        count = len(expired)
+        expired.unlink()
+        _logger.info(f"Cleaned up {count} expired image URL cache entries")
+        return count
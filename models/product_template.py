@@ -16,11 +16,18 @@ class ProductTemplate(models.Model):
     ], string='Image Source')
     
     image_quality_score = fields.Float('Image Quality Score', help='Internal quality score for image')
+    # Stored so the scans filter on an indexed column instead of joining attachments
+    image_missing = fields.Boolean('Missing Image', compute='_compute_image_missing', store=True, index=True)
     
     # Enhanced search fields for better matching
     manufacturer_part_number = fields.Char('Manufacturer Part Number (MPN)')
     upc_code = fields.Char('UPC Code')
     
+    @api.depends('image_1920')
+    def _compute_image_missing(self):
+        for product in self.with_context(bin_size=True):
+            product.image_missing = not product.image_1920
+    
     def action_fetch_images_manual(self):
         """Manual action to fetch images for selected products"""
         ImageFetcher = self.env['product.image.fetcher']
@@ -36,9 +43,12 @@ class ProductTemplate(models.Model):
         }
     
     def has_product_image(self):
-        """Check if product has at least one image"""
+        """Check if product has at least one image
+        
+        Reads the image size (bin_size) rather than the image data itself.
+        """
         self.ensure_one()
-        return bool(self.image_1920)
+        return bool(self.with_context(bin_size=True).image_1920)
     
     def get_search_keywords(self):
         """Get search keywords for image fetching"""
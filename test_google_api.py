@@ -50,6 +50,8 @@ def test_google_custom_search():
         return False
     
     success_count = 0
+    # One session for all queries so the connection to Google is reused
+    session = requests.Session()
     
     for i, query in enumerate(test_queries, 1):
         print(f"\nTest {i}: Searching for '{query}'")
@@ -69,7 +71,7 @@ def test_google_custom_search():
                 'safe': 'active'
             }
             
-            response = requests.get(url, params=params, timeout=30)
+            response = session.get(url, params=params, timeout=30)
             
             print(f"Status Code: {response.status_code}")
             
@@ -131,6 +133,8 @@ def test_google_custom_search():
         except Exception as e:
             print(f"❌ ERROR: Unexpected error - {str(e)}")
     
+    session.close()
+    
     print("\n" + "=" * 60)
     print("SUMMARY")
     print("=" * 60)
@@ -1,6 +1,20 @@
+import base64
+import hashlib
+import io
 import logging
+import threading
+import time
+import uuid
+from odoo.exceptions import ValidationError
 from odoo.tests.common import TransactionCase
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
+from PIL import Image
+
+from ..models import image_fetcher_service
+from ..models.image_fetcher_service import (
+    BatchWrites, ConfigSnapshot, ProductRef, _StoredImage, _TokenBucket, _api_bucket, _cse_bucket, _probe_image_header, _simhash,
+)
 
 _logger = logging.getLogger(__name__)
 
@@ -52,6 +66,7 @@ class TestProductImageAutomation(TransactionCase):
         """Test image detection functionality"""
         # Initially should have no image
         self.assertFalse(self.test_product.has_product_image())
+        self.assertTrue(self.test_product.image_missing)
         
         # Add a test image (base64 encoded 1x1 pixel)
         test_image = b'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
@@ -61,6 +76,7 @@ class TestProductImageAutomation(TransactionCase):
         
         # Now should detect image
         self.assertTrue(self.test_product.has_product_image())
+        self.assertFalse(self.test_product.image_missing)
     
     def test_configuration_validation(self):
         """Test configuration validation methods"""
@@ -144,4 +160,401 @@ class TestProductImageAutomation(TransactionCase):
         active_config = self.env['product.image.config'].get_active_config()
         
         # Should return our test configuration (since it's active)
-        self.assertEqual(active_config, self.test_config)
\ No newline at end of file
+        self.assertEqual(active_config, self.test_config)
+    
+    def test_negative_cache(self):
+        """Test that empty searches are remembered until the version changes"""
+        cache = self.env['product.image.negative.cache']
+        query_hash = cache._query_hash('Test Product', 'test_engine_id', 0)
+        
+        self.assertFalse(cache._get_known_empty({query_hash}))
+        
+        cache._mark_empty({query_hash})
+        cache._mark_empty({query_hash})  # Refreshing an entry must not duplicate it
+        self.assertEqual(cache._get_known_empty({query_hash}), {query_hash})
+        self.assertEqual(cache.search_count([('query_hash', '=', query_hash)]), 1)
+        
+        # A new cache version yields a different key
+        self.assertNotEqual(cache._query_hash('Test Product', 'test_engine_id', 1), query_hash)
+    
+    def test_search_cache(self):
+        """Test that stored search responses are served until they expire"""
+        cache = self.env['product.image.search.cache']
+        
+        cache._store({'fresh': ({'items': [1]}, 3600), 'stale': ({'items': []}, -1)})
+        cache._store({'fresh': ({'items': [2]}, 3600)})  # Refreshing an entry must not duplicate it
+        
+        valid = cache._get_valid()
+        self.assertEqual(list(valid), ['fresh'])
+        self.assertEqual(valid['fresh'][0], {'items': [2]})
+        self.assertFalse(cache._get_valid(['stale', 'unknown']))
+        self.assertEqual(cache.search_count([('cache_key', '=', 'fresh')]), 1)
+        
+        self.assertEqual(cache.cleanup_expired(), 1)
+    
+    def test_url_cache(self):
+        """Test that image URLs are remembered once and can be forgotten"""
+        cache = self.env['product.image.url.cache']
+        info = {'checksum': 'a' * 40, 'width': 800, 'height': 600, 'source_url': 'http://test.com/image.png'}
+        
+        cache._remember({'url_hash': info})
+        cache._remember({'url_hash': dict(info, width=1024)})  # Refreshing an entry must not duplicate it
+        
+        self.assertEqual(cache._get_recent(), {'url_hash': dict(info, width=1024)})
+        self.assertEqual(cache.search_count([('url_hash', '=', 'url_hash')]), 1)
+        
+        cache._forget('url_hash')
+        self.assertFalse(cache._get_recent())
+    
+    def _make_image(self, size, image_format):
+        """Encode a plain image of the given size"""
+        buffer = io.BytesIO()
+        Image.new('RGB', size, color='red').save(buffer, format=image_format)
+        return buffer.getvalue()
+    
+    def test_probe_image_header(self):
+        """Test that PNG and JPEG dimensions are read from the header alone"""
+        png = _probe_image_header(self._make_image((800, 600), 'PNG'))
+        self.assertEqual((png.format, png.width, png.height), ('PNG', 800, 600))
+        
+        jpeg = _probe_image_header(self._make_image((640, 480), 'JPEG'))
+        self.assertEqual((jpeg.format, jpeg.width, jpeg.height), ('JPEG', 640, 480))
+        
+        # Only the first bytes are needed
+        self.assertEqual(_probe_image_header(self._make_image((800, 600), 'PNG')[:24]).size, (800, 600))
+        self.assertIsNone(_probe_image_header(self._make_image((800, 600), 'GIF')))
+    
+    def test_small_image_aborted_from_header(self):
+        """Test that a download stops as soon as the header shows a too small image"""
+        chunks_read = []
+        
+        def iter_content(chunk_size):
+            for chunk in (self._make_image((100, 100), 'PNG'), b'\0' * chunk_size):
+                chunks_read.append(chunk)
+                yield chunk
+        
+        response = MagicMock(status_code=200, headers={'content-type': 'image/png'})
+        response.iter_content.side_effect = iter_content
+        session = MagicMock()
+        session.get.return_value = response
+        
+        fetcher = self.env['product.image.fetcher']
+        image_data, image_info = fetcher._download_and_validate_image(
+            f'https://m.media-amazon.com/images/{uuid.uuid4().hex}.png', self.test_config, 'test', session
+        )
+        
+        self.assertIsNone(image_data)
+        self.assertEqual(image_info, {'rejected': True})
+        self.assertEqual(len(chunks_read), 1)
+        response.close.assert_called_once()
+        session.head.assert_not_called()  # Known image CDNs are not probed
+    
+    def test_transient_failure_not_cached_as_empty(self):
+        """Test that a Google search only counts as empty when its images were rejected"""
+        fetcher = self.env['product.image.fetcher']
+        self.test_config.google_api_keys = 'AIza' + 'x' * 35  # Passes the key format check
+        snapshot = ConfigSnapshot(self.test_config, fetcher._get_enabled_sources(self.test_config))
+        search = {'items': [{'link': 'https://example.com/a.jpg'}, {'link': 'https://example.com/b.jpg'}]}
+        
+        def fetch(*downloads):
+            with patch.object(type(fetcher), '_cached_cse', return_value=search), \
+                    patch.object(type(fetcher), '_download_and_validate_image', side_effect=downloads):
+                return fetcher._fetch_from_google(self.test_product, 'Test Product', snapshot, MagicMock())
+        
+        # A timeout or an HTTP error leaves the outcome unknown
+        self.assertEqual(fetch((None, {'rejected': True}), (None, {})), (None, {}))
+        self.assertEqual(fetch((None, {'rejected': True}), (None, {'rejected': True})), (None, {'no_results': True}))
+    
+    def test_stored_image_fallback(self):
+        """Test that an image believed stored is downloaded again when its attachment is missing"""
+        fetcher = self.env['product.image.fetcher']
+        image = self._make_image((800, 600), 'PNG')
+        info = {'checksum': 'f' * 40, 'source_url': 'https://example.com/gone.png', 'source': 'google'}
+        result = {
+            'image_data': _StoredImage(info['checksum']),
+            'image_info': info,
+            'description_data': {},
+            'image_attempted': True,
+            'google_empty': False,
+            'description_empty': False,
+            'start_time': time.perf_counter(),
+        }
+        downloaded = dict(info, checksum=hashlib.sha1(image).hexdigest(), width=800, height=600, format='PNG')
+        
+        with patch.object(type(fetcher), '_download_and_validate_image',
+                          return_value=(memoryview(image), downloaded)) as download:
+            fetcher._apply_product_result(self.test_product, result, self.test_config, 'test_batch', 'manual')
+        
+        download.assert_called_once_with(info['source_url'], self.test_config, 'google')
+        self.assertTrue(self.test_product.has_product_image())
+        self.assertEqual(self.test_product.image_fetch_source, 'google')
+    
+    def test_image_missing_domain(self):
+        """Test that products are scanned by the stored image_missing flag"""
+        fetcher = self.env['product.image.fetcher']
+        missing = [('image_missing', '=', True), ('id', '=', self.test_product.id)]
+        self.assertEqual(self.env['product.template'].search(missing), self.test_product)
+        self.assertIn(self.test_product, fetcher._get_products_needing_images(self.test_config))
+        
+        self.test_product.image_1920 = base64.b64encode(self._make_image((800, 600), 'PNG'))
+        
+        self.assertFalse(self.env['product.template'].search(missing))
+        self.assertNotIn(self.test_product, fetcher._get_products_needing_images(self.test_config))
+    
+    def _fake_time(self):
+        """Stand-in for the fetcher module's time whose clock only advances
+        by sleeping, so rate limits are tested without waiting"""
+        fake_time = MagicMock()
+        fake_time.monotonic.side_effect = lambda: 1000.0 + sum(self._sleeps(fake_time))
+        return fake_time
+    
+    def _sleeps(self, fake_time):
+        """Seconds slept on a _fake_time(), in order"""
+        return [call.args[0] for call in fake_time.sleep.call_args_list]
+    
+    def test_token_bucket(self):
+        """Test that the token bucket only blocks once its burst is spent"""
+        fake_time = self._fake_time()
+        with patch.object(image_fetcher_service, 'time', fake_time):
+            bucket = _TokenBucket(2.0, 3)
+            for i in range(3):
+                bucket.acquire()
+            self.assertEqual(self._sleeps(fake_time), [])
+            
+            # The next token arrives after 1 / rate seconds
+            bucket.acquire()
+            self.assertEqual(self._sleeps(fake_time), [0.5])
+            
+            # A penalty empties the bucket and holds it back for its duration
+            bucket.penalize(10)
+            bucket.acquire()
+            self.assertAlmostEqual(sum(self._sleeps(fake_time)[1:]), 10.5)
+        
+        # Each Google API key has a bucket of its own
+        self.assertIs(_cse_bucket('key_a'), _cse_bucket('key_a'))
+        self.assertIsNot(_cse_bucket('key_a'), _cse_bucket('key_b'))
+    
+    def test_api_bucket(self):
+        """Test that a configuration's API buckets are reused until its rate changes"""
+        config_id = self.test_config.id
+        bucket = _api_bucket(config_id, 'google', 31)
+        
+        # 31 / 60 * 60 is not 31.0, which must not rebuild the bucket
+        self.assertIs(_api_bucket(config_id, 'google', 31), bucket)
+        self.assertIsNot(_api_bucket(config_id, 'bing', 31), bucket)  # Each API has its own budget
+        
+        rebuilt = _api_bucket(config_id, 'google', 120)
+        self.assertIsNot(rebuilt, bucket)
+        self.assertEqual(rebuilt.rate, 2.0)
+        self.assertIsNone(_api_bucket(config_id, 'google', 0))  # 0 means unlimited
+    
+    def test_rate_limit_backoff(self):
+        """Test that consecutive 429s for a key back off exponentially until one succeeds"""
+        fetcher = self.env['product.image.fetcher']
+        key = uuid.uuid4().hex
+        throttled = MagicMock(status_code=429, headers={})
+        bucket = MagicMock()
+        fake_time = self._fake_time()
+        
+        with patch.object(image_fetcher_service, 'time', fake_time), \
+                patch.object(image_fetcher_service.random, 'uniform', return_value=1.0):
+            for i in range(3):
+                self.assertTrue(fetcher._handle_rate_limit(throttled, "Bing Image Search", key=key, bucket=bucket))
+            self.assertEqual(self._sleeps(fake_time), [1, 2, 4])
+            # The key's bucket is held back for the other workers too
+            self.assertEqual([call.args[0] for call in bucket.penalize.call_args_list], [1, 2, 4])
+            
+            # A success resets the key's backoff
+            self.assertFalse(fetcher._handle_rate_limit(MagicMock(status_code=200), "Bing Image Search", key=key))
+            fetcher._handle_rate_limit(throttled, "Bing Image Search", key=key)
+            self.assertEqual(self._sleeps(fake_time)[-1], 1)
+            
+            # Retry-After is honoured as given
+            fetcher._handle_rate_limit(MagicMock(status_code=429, headers={'Retry-After': '7'}),
+                                       "Bing Image Search", key=key)
+            self.assertEqual(self._sleeps(fake_time)[-1], 7)
+    
+    def test_rate_limit_key_rotation(self):
+        """Test that a throttled Google search is retried at once with the next key"""
+        fetcher = self.env['product.image.fetcher']
+        keys = ['AIza' + uuid.uuid4().hex for i in range(2)]
+        self.test_config.google_api_keys = '\n'.join(keys)
+        snapshot = ConfigSnapshot(self.test_config, fetcher._get_enabled_sources(self.test_config))
+        responses = [MagicMock(status_code=429, headers={}), MagicMock(status_code=200)]
+        used_keys = []
+        
+        def get(url, params, timeout):
+            used_keys.append(params['key'])
+            return responses.pop(0)
+        
+        session = MagicMock()
+        session.get.side_effect = get
+        params = {'key': snapshot.get_current_google_api_key(), 'q': 'Test Product'}
+        with patch.object(type(fetcher), '_get_search_client', return_value=None), \
+                patch.object(image_fetcher_service.time, 'sleep') as sleep:
+            response = fetcher._cse_get(session, fetcher._GOOGLE_SEARCH_URL, params, snapshot, "Google Images API")
+        
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(used_keys, keys)
+        sleep.assert_not_called()
+        
+        # The rotated index is written back to the configuration
+        snapshot.sync_to(self.test_config)
+        self.assertEqual(self.test_config.current_api_key_index, 1)
+    
+    def test_description_near_duplicates(self):
+        """Test that snippets differing in a word or two are kept once"""
+        fetcher = self.env['product.image.fetcher']
+        max_distance = image_fetcher_service.SIMHASH_MAX_DISTANCE
+        snippet = "Stainless steel water bottle with double wall vacuum insulation and a leak proof lid."
+        variant = "Durable stainless steel water bottle with double wall vacuum insulation and a leak proof lid."
+        other = "Wireless optical mouse with an adjustable DPI sensor and silent clicks."
+        
+        self.assertLess(bin(_simhash(snippet) ^ _simhash(variant)).count('1'), max_distance)
+        self.assertGreaterEqual(bin(_simhash(snippet) ^ _simhash(other)).count('1'), max_distance)
+        
+        # Short descriptions get the next kept snippet appended
+        self.assertEqual(fetcher._create_product_description([snippet, variant, other], 'Bottle'),
+                         f"{snippet} {other}")
+        self.assertEqual(fetcher._create_product_description([snippet, variant], 'Bottle'), snippet)
+    
+    def test_batch_writes_discard(self):
+        """Test that discarding a product drops only what was queued for it"""
+        pending = BatchWrites()
+        pending.add_product_vals(1, {'description_sale': 'Text'})
+        pending.add_product_vals(1, {'image_fetch_source': 'google'})  # Merged into one write
+        pending.logs.append({'product_id': 1})
+        
+        mark = pending.mark()
+        pending.add_product_vals(2, {'description_sale': 'Text'})
+        pending.logs.append({'product_id': 2})
+        pending.attachments.append({'res_id': 2})
+        pending.image_urls.append((2, 'url_hash', {}, None))
+        pending.discard(2, mark)
+        
+        self.assertEqual(pending.product_vals, {1: {'description_sale': 'Text', 'image_fetch_source': 'google'}})
+        self.assertEqual(pending.logs, [{'product_id': 1}])
+        self.assertEqual((pending.attachments, pending.image_urls), ([], []))
+    
+    def test_batch_flush_isolates_failed_products(self):
+        """Test that a product whose write fails loses its attachments and success
+        entries without undoing the other products of the batch"""
+        fetcher = self.env['product.image.fetcher']
+        locked = self.env['product.template'].create({'name': 'Locked Product'})
+        pending = BatchWrites()
+        for product in (self.test_product, locked):
+            pending.add_product_vals(product.id, {'description_sale': 'Fetched description'})
+            pending.attachments.append({
+                'name': 'tracking', 'res_model': 'product.template', 'res_id': product.id,
+                'type': 'binary', 'raw': b'image',
+            })
+            pending.image_urls.append((product.id, f'url_hash_{product.id}', {'checksum': 'a' * 40}, None))
+            fetcher._log_operation(pending, product.id, 'fetch', 'success', 'Saved',
+                                   batch_id='test_batch', job_type='manual')
+        
+        Product = type(self.env['product.template'])
+        write = Product.write
+        
+        def locked_write(records, vals):
+            if locked in records:
+                raise ValidationError("Locked")
+            return write(records, vals)
+        
+        with patch.object(Product, 'write', locked_write):
+            fetcher._flush_batch_writes(pending, 'test_batch', 'manual')
+        
+        self.assertEqual(self.test_product.description_sale, 'Fetched description')
+        self.assertFalse(locked.description_sale)
+        
+        attachments = self.env['ir.attachment'].search([('res_model', '=', 'product.template'), ('name', '=', 'tracking')])
+        self.assertEqual(attachments.mapped('res_id'), [self.test_product.id])
+        self.assertEqual(pending.image_urls, [(self.test_product.id, f'url_hash_{self.test_product.id}',
+                                               {'checksum': 'a' * 40}, None)])
+        
+        logs = self.env['product.image.log'].search([('batch_id', '=', 'test_batch')])
+        self.assertEqual(logs.filtered(lambda log: log.product_id == self.test_product).mapped('status'), ['success'])
+        self.assertEqual(logs.filtered(lambda log: log.product_id == locked).mapped('status'), ['failed'])
+    
+    def test_race_stops_losing_sources(self):
+        """Test that the first image wins the race and stops the other sources"""
+        fetcher = self.env['product.image.fetcher']
+        job = {'product': ProductRef(1, 'Test'), 'sources': ('amazon', 'google', 'bing')}
+        started, stopped = set(), set()
+        
+        def fetch(source, job, config, session, amazon, cancel):
+            started.add(source)
+            if source == 'google':
+                return b'image', {'source': 'google'}
+            # The losers run until told to stop, as a slow download would
+            self.assertTrue(cancel.wait(5))
+            stopped.add(source)
+            return None, {}
+        
+        with ThreadPoolExecutor(max_workers=3) as executor, \
+                patch.object(type(fetcher), '_fetch_image_from', side_effect=fetch):
+            result = fetcher._race_image_sources(job, None, None, None, executor)
+        
+        self.assertEqual(result, (b'image', {'source': 'google'}, False))
+        # Every loser that started was stopped before the race returned; one
+        # the pool had not started yet is dropped
+        self.assertIn('amazon', stopped)
+        self.assertEqual(stopped, started - {'google'})
+    
+    def test_race_on_busy_pool(self):
+        """Test that sources the run's pool cannot start run on the racing worker"""
+        fetcher = self.env['product.image.fetcher']
+        job = {'product': ProductRef(1, 'Test'), 'sources': ('amazon', 'google')}
+        results = {'amazon': (None, {}), 'google': (None, {'no_results': True})}
+        release = threading.Event()
+        
+        with ThreadPoolExecutor(max_workers=1) as executor, \
+                patch.object(type(fetcher), '_fetch_image_from',
+                             side_effect=lambda source, *args: results[source]) as fetch:
+            executor.submit(release.wait, 5)  # Another product holds the only thread
+            result = fetcher._race_image_sources(job, None, None, None, executor)
+            release.set()
+        
+        self.assertEqual(result, (None, {}, True))
+        self.assertEqual([call.args[0] for call in fetch.call_args_list], ['amazon', 'google'])
+    
+    def test_checksum_deduplication(self):
+        """Test that images are deduplicated by checksum, in the database and within a run"""
+        fetcher = self.env['product.image.fetcher']
+        image = self._make_image((800, 600), 'PNG')
+        checksum = hashlib.sha1(image).hexdigest()
+        
+        self.assertNotIn(checksum, fetcher._get_product_image_checksums())
+        self.assertFalse(fetcher._is_duplicate_image(checksum, self.test_config))
+        
+        self.test_product.image_1920 = base64.b64encode(image)
+        self.assertIn(checksum, fetcher._get_product_image_checksums())
+        self.assertTrue(fetcher._is_duplicate_image(checksum, self.test_config))
+        
+        # Runs check the checksums loaded at their start and those saved since
+        pending = BatchWrites(fetcher._get_product_image_checksums())
+        self.assertTrue(fetcher._is_duplicate_image(checksum, self.test_config, pending))
+        self.assertFalse(fetcher._is_duplicate_image('b' * 40, self.test_config, pending))
+        self.assertTrue(fetcher._is_duplicate_image('b' * 40, self.test_config, pending))
+        
+        self.test_config.enable_deduplication = False
+        self.assertFalse(fetcher._is_duplicate_image(checksum, self.test_config, pending))
+    
+    def test_enqueue_products(self):
+        """Test that runs are split into one queue job per batch_size chunk"""
+        fetcher = self.env['product.image.fetcher']
+        products = self.env['product.template'].create([{'name': f'Queued Product {i}'} for i in range(5)])
+        self.test_config.batch_size = 2
+        Environment = type(self.env)
+        contains = Environment.__contains__
+        
+        with patch.object(Environment, '__contains__', lambda env, name: name != 'queue.job' and contains(env, name)):
+            self.assertFalse(fetcher._enqueue_products(products, self.test_config, 'test_batch', 'daily'))
+        
+        with patch.object(Environment, '__contains__', lambda env, name: name == 'queue.job' or contains(env, name)), \
+                patch.object(type(fetcher), 'with_delay', create=True) as with_delay:
+            self.assertTrue(fetcher._enqueue_products(products, self.test_config, 'test_batch', 'daily', True))
+        
+        self.assertEqual({call.kwargs['channel'] for call in with_delay.call_args_list}, {'root.image_fetch'})
+        jobs = with_delay.return_value._process_product_ids.call_args_list
+        self.assertEqual([call.args[0] for call in jobs], [products[:2].ids, products[2:4].ids, products[4:].ids])
+        self.assertEqual({call.args[1:] for call in jobs}, {('test_batch', 'daily', True)})